@@ -0,0 +1,158 @@
+"""
+Streaming product import/export.
+
+Rows are parsed one at a time from CSV or JSON lines, validated and
+upserted in batches, so memory use depends on the batch size rather than
+the catalog size. Rows carrying an `id` replace that product, rows without
+one are inserted as new products once the primary key sequence has been
+moved past the ids of their batch.
+"""
+import csv
+import io
+import json
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connection, transaction
+from rest_framework import serializers
+
+from api.cache import bump_catalog_version
+from api.changes import record_changes
+from api.models import CatalogChange, Product
+from api.snapshots import schedule_rebuild
+
+FORMATS = ('csv', 'jsonl')
+FIELDS = ['id', 'name', 'description', 'original_price', 'price',
+          'category', 'stock']
+UPDATE_FIELDS = [field for field in FIELDS if field != 'id'] + [
+    'discount_percentage']
+BATCH_SIZE = 1000
+MAX_REPORTED_ERRORS = 100
+
+
+class ProductImportSerializer(serializers.ModelSerializer):
+    id = serializers.IntegerField(required=False, min_value=1)
+
+    class Meta:
+        model = Product
+        fields = FIELDS
+
+
+def guess_format(filename, default='csv'):
+    for fmt in FORMATS:
+        if filename and filename.lower().endswith('.' + fmt):
+            return fmt
+    return default
+
+
+def parse_rows(stream, fmt):
+    """Yield (line number, row dict or None on a malformed line)"""
+    if fmt == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, {
+                key.strip(): value for key, value in row.items()
+                if key and value not in ('', None)
+            }
+    elif fmt == 'jsonl':
+        for line_num, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_num, row if isinstance(row, dict) else None
+    else:
+        raise ValueError(f'Unsupported format: {fmt}')
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
+def _reset_sequence():
+    # Explicit ids do not advance the primary key sequence on Postgres
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), [Product]):
+            cursor.execute(sql)
+
+
+def _upsert(products):
+    # The last row wins when an id repeats within a batch
+    replaced = list({product.pk: product for product in products if product.pk}.values())
+    created = [product for product in products if not product.pk]
+    with transaction.atomic():
+        if replaced:
+            replaced = Product.objects.bulk_create(
+                replaced,
+                update_conflicts=True,
+                unique_fields=['id'],
+                update_fields=UPDATE_FIELDS,
+            )
+            # Before the new rows draw ids, which could otherwise be taken
+            _reset_sequence()
+        created = Product.objects.bulk_create(created)
+        record_changes(CatalogChange.PRODUCT,
+                       [product.pk for product in replaced + created])
+
+
+def import_products(stream, fmt, batch_size=BATCH_SIZE):
+    """Validate and upsert rows from a text stream, batch by batch"""
+    validator = ProductImportSerializer()
+    imported = 0
+    failed = 0
+    errors = []
+
+    for chunk in _chunks(parse_rows(stream, fmt), batch_size):
+        products = []
+        for line_num, row in chunk:
+            try:
+                if row is None:
+                    raise serializers.ValidationError('Malformed row')
+                data = validator.run_validation(row)
+            except serializers.ValidationError as exc:
+                failed += 1
+                if len(errors) < MAX_REPORTED_ERRORS:
+                    errors.append({'line': line_num, 'errors': exc.detail})
+                continue
+            product = Product(**data)
+            product.discount_percentage = product.compute_discount_percentage()
+            products.append(product)
+        if products:
+            _upsert(products)
+            imported += len(products)
+
+    if imported:
+        bump_catalog_version()
+        transaction.on_commit(schedule_rebuild)
+
+    return {'imported': imported, 'failed': failed, 'errors': errors}
+
+
+class _Echo:
+    def write(self, value):
+        return value
+
+
+def export_products(fmt, chunk_size=2000):
+    """Yield the catalog as CSV or JSON lines, one row at a time"""
+    rows = Product.objects.order_by('pk').values_list(*FIELDS).iterator(
+        chunk_size=chunk_size)
+    if fmt == 'csv':
+        writer = csv.writer(_Echo())
+        yield writer.writerow(FIELDS)
+        for row in rows:
+            yield writer.writerow(row)
+    elif fmt == 'jsonl':
+        for row in rows:
+            yield json.dumps(dict(zip(FIELDS, row)), cls=DjangoJSONEncoder) + '\n'
+    else:
+        raise ValueError(f'Unsupported format: {fmt}')
+
+
+def text_stream(binary_file):
+    return io.TextIOWrapper(binary_file, encoding='utf-8-sig', newline='')
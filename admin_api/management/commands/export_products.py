@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from admin_api.catalog_io import FORMATS, export_products, guess_format
+
+
+class Command(BaseCommand):
+    help = "Stream the product catalog to a CSV or JSON lines file (stdout by default)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', nargs='?')
+        parser.add_argument('--format', choices=FORMATS)
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or guess_format(options['path'])
+        if options['path']:
+            with open(options['path'], 'w', encoding='utf-8', newline='') as out:
+                out.writelines(export_products(fmt))
+        else:
+            for chunk in export_products(fmt):
+                self.stdout.write(chunk, ending='')
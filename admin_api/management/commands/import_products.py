@@ -0,0 +1,30 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from admin_api.catalog_io import BATCH_SIZE, FORMATS, guess_format, import_products
+
+
+class Command(BaseCommand):
+    help = "Upsert products from a CSV or JSON lines file ('-' reads stdin)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=FORMATS)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or guess_format(options['path'])
+        try:
+            if options['path'] == '-':
+                result = import_products(sys.stdin, fmt, options['batch_size'])
+            else:
+                with open(options['path'], encoding='utf-8-sig', newline='') as stream:
+                    result = import_products(stream, fmt, options['batch_size'])
+        except OSError as exc:
+            raise CommandError(exc)
+
+        for error in result['errors']:
+            self.stderr.write(f"line {error['line']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {result['imported']} products, {result['failed']} rows failed"))
@@ -1,3 +1,104 @@
+import io
+import json
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase
 
-# Create your tests here.
+from api.models import CatalogChange, Product
+
+from . import catalog_io
+from .catalog_io import FIELDS
+
+
+class CatalogImportExportTests(TestCase):
+    def setUp(self):
+        self.client.force_login(User.objects.create_superuser('admin', password='secret'))
+
+    def make_products(self):
+        Product.objects.create(name='Shirt', price=10, original_price=20,
+                               category='Women', stock=3, description='Cotton')
+        Product.objects.create(name='Scarf, "wool"', price='7.50', category='Men')
+        return list(Product.objects.order_by('pk').values_list(*FIELDS))
+
+    def export(self, fmt):
+        response = self.client.get(f'/adm/products/export/?file_format={fmt}')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def upload(self, content, name):
+        response = self.client.post('/adm/products/import/', {
+            'file': SimpleUploadedFile(name, content.encode())})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_round_trips(self):
+        for fmt in ['csv', 'jsonl']:
+            with self.subTest(fmt=fmt):
+                Product.objects.all().delete()
+                rows = self.make_products()
+                content = self.export(fmt)
+                Product.objects.all().delete()
+
+                result = self.upload(content, f'products.{fmt}')
+                self.assertEqual(result, {'imported': 2, 'failed': 0, 'errors': []})
+                self.assertEqual(list(Product.objects.order_by('pk').values_list(*FIELDS)), rows)
+                self.assertEqual(Product.objects.get(name='Shirt').discount_percentage, 50)
+
+    def test_reports_errors_per_line(self):
+        content = '\n'.join([
+            json.dumps({'name': 'Shirt', 'price': '10', 'category': 'Women'}),
+            '{not json',
+            '',
+            json.dumps({'name': 'Hat', 'price': 'free', 'category': 'Women'}),
+            json.dumps({'name': 'Sock', 'price': '2', 'category': 'Pets'}),
+        ])
+        result = self.upload(content, 'products.jsonl')
+
+        self.assertEqual((result['imported'], result['failed']), (1, 3))
+        self.assertEqual([error['line'] for error in result['errors']], [2, 4, 5])
+        self.assertEqual(list(result['errors'][1]['errors']), ['price'])
+        self.assertEqual(list(result['errors'][2]['errors']), ['category'])
+        self.assertEqual(list(Product.objects.values_list('name', flat=True)), ['Shirt'])
+
+    def test_upserts_by_id(self):
+        product = Product.objects.create(name='Shirt', price=10, category='Women')
+        content = '\n'.join([
+            'id,name,price,category',
+            'Ignored,,,',
+            f'{product.pk},Old shirt,1,Women',
+            f'{product.pk + 10},Coat,50,Men',
+            ',Hat,5,Men',
+            f'{product.pk},Shirt v2,12,Women',
+        ])
+        with self.captureOnCommitCallbacks(execute=True):
+            result = self.upload(content, 'products.csv')
+
+        self.assertEqual(result['imported'], 4)
+        self.assertEqual(result['failed'], 1)
+        product.refresh_from_db()
+        self.assertEqual((product.name, product.price), ('Shirt v2', 12))
+        self.assertEqual(Product.objects.get(pk=product.pk + 10).name, 'Coat')
+        hat = Product.objects.get(name='Hat')
+        self.assertNotIn(hat.pk, (product.pk, product.pk + 10))
+        self.assertEqual(Product.objects.count(), 3)
+        self.assertEqual(
+            set(CatalogChange.objects.values_list('object_id', flat=True)),
+            {product.pk, product.pk + 10, hat.pk})
+
+    def test_sequence_reset_before_new_rows(self):
+        content = 'id,name,price,category\n100,Coat,50,Men\n,Hat,5,Men\n,Cap,4,Men\n'
+        names_at_reset = []
+        reset = mock.patch.object(catalog_io, '_reset_sequence', side_effect=lambda: (
+            names_at_reset.append(sorted(Product.objects.values_list('name', flat=True)))))
+        with reset:
+            result = catalog_io.import_products(io.StringIO(content), 'csv', batch_size=2)
+
+        self.assertEqual(result['imported'], 3)
+        # Only the batch with an explicit id resets it, before its own new rows
+        self.assertEqual(names_at_reset, [['Coat']])
+
+    def test_requires_an_admin(self):
+        self.client.logout()
+        self.assertEqual(self.client.get('/adm/products/export/').status_code, 403)
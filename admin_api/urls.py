@@ -1,5 +1,7 @@
 from django.urls import path
 from . import views
 urlpatterns = [
-
+    path('products/import/', views.ProductImportView.as_view()),
+    path('products/export/', views.ProductExportView.as_view()),
+    path('products/<int:pk>/images/', views.ProductImageUploadView.as_view()),
 ]
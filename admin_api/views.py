@@ -1,8 +1,14 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
+from django.http import StreamingHttpResponse
+from django.shortcuts import get_object_or_404
 from api.models import *
 from api.serializers import *
+from api.uploads import upload_product_images
+from .catalog_io import FORMATS, export_products, guess_format, import_products, text_stream
 
 
 class ProductListView(APIView):
@@ -16,3 +22,48 @@ class ProductView(APIView):
     def post(self, request, pk):
         name = request.data.get('name')
         description = request.data.get('description')
+
+
+class ProductImportView(APIView):
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        upload = request.FILES.get('file')
+        if upload is None:
+            return Response({'error': 'A file is required'}, status=status.HTTP_400_BAD_REQUEST)
+        fmt = request.query_params.get('file_format') or guess_format(upload.name)
+        if fmt not in FORMATS:
+            return Response({'error': f'file_format must be one of {", ".join(FORMATS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        result = import_products(text_stream(upload.file), fmt)
+        return Response(result, status=status.HTTP_200_OK)
+
+
+class ProductExportView(APIView):
+    permission_classes = [IsAdminUser]
+
+    def get(self, request):
+        fmt = request.query_params.get('file_format', 'csv')
+        if fmt not in FORMATS:
+            return Response({'error': f'file_format must be one of {", ".join(FORMATS)}'}, status=status.HTTP_400_BAD_REQUEST)
+        content_type = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+        response = StreamingHttpResponse(export_products(fmt), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="products.{fmt}"'
+        return response
+
+
+class ProductImageUploadView(APIView):
+    permission_classes = [IsAdminUser]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request, pk):
+        product = get_object_or_404(Product, pk=pk)
+        files = request.FILES.getlist('images')
+        if not files:
+            return Response({'error': 'No images were sent'}, status=status.HTTP_400_BAD_REQUEST)
+        images, failures = upload_product_images(
+            product, files, alt_text=request.data.get('alt_text', product.name))
+        return Response({
+            'images': ProductImageSerializer(images, many=True).data,
+            'failed': [{'file': name, 'error': str(error)} for name, error in failures],
+        }, status=status.HTTP_201_CREATED if images else status.HTTP_502_BAD_GATEWAY)
@@ -1,12 +1,17 @@
-from django.contrib import admin
+from django.contrib import admin, messages
+from django.db import transaction
+from .forms import ProductAdminForm
 from .models import Product, Cart, CartItem,  ProductImage, CustomerMessage
+from .uploads import upload_product_images
 from django.utils.html import format_html
 
 
 class ProductImageInline(admin.TabularInline):
     model = ProductImage
     extra = 1
-    readonly_fields = ('image_preview', 'thumbnail_preview')
+    exclude = ('placeholder', 'srcset')
+    readonly_fields = ('image_preview', 'thumbnail_preview', 'width', 'height',
+                       'dominant_color')
 
     def image_preview(self, obj):
         if obj.image:
@@ -31,19 +36,48 @@ class ProductImageInline(admin.TabularInline):
 
 @admin.register(Product)
 class ProductAdmin(admin.ModelAdmin):
+    form = ProductAdminForm
     inlines = [ProductImageInline]
+    list_display = ['name', 'category', 'price', 'stock', 'image_count']
+    list_filter = ['category']
+    search_fields = ['name']
+    ordering = ['-id']
+    list_per_page = 50
+    readonly_fields = ('cover_image_url', 'image_count', 'discount_percentage',
+                       'view_count', 'cart_add_count', 'popularity')
+    show_full_result_count = False
 
-    def image_count(self, obj):
-        return obj.images.count()
-    image_count.short_description = "Images"
+    def save_related(self, request, form, formsets, change):
+        super().save_related(request, form, formsets, change)
+        files = form.cleaned_data.get('bulk_images')
+        if files:
+            # Uploads retry with backoff, keep them out of the changeform's
+            # transaction so it does not stay open meanwhile
+            transaction.on_commit(
+                lambda: self.upload_bulk_images(request, form.instance, files))
+
+    def upload_bulk_images(self, request, product, files):
+        images, failures = upload_product_images(product, files, alt_text=product.name)
+        if images:
+            self.message_user(
+                request, f"Uploaded {len(images)} images", messages.SUCCESS)
+        for name, error in failures:
+            self.message_user(
+                request, f"Could not upload {name}: {error}", messages.ERROR)
 
 
 @admin.register(ProductImage)
 class ProductImageAdmin(admin.ModelAdmin):
-    list_display = ['product', 'image_preview',
-                    'thumbnail_preview', 'created_at']
-    list_filter = ['product', 'created_at']
-    readonly_fields = ('image_preview', 'thumbnail_preview')
+    list_display = ['product', 'thumbnail_preview', 'created_at']
+    list_select_related = ['product']
+    list_filter = ['created_at']
+    search_fields = ['product__name']
+    autocomplete_fields = ['product']
+    exclude = ('placeholder', 'srcset')
+    readonly_fields = ('image_preview', 'thumbnail_preview', 'width', 'height',
+                       'dominant_color')
+    list_per_page = 50
+    show_full_result_count = False
 
     def image_preview(self, obj):
         if obj.image:
@@ -66,7 +100,19 @@ class ProductImageAdmin(admin.ModelAdmin):
     thumbnail_preview.short_description = "Thumbnail Preview"
 
 
-admin.site.register(Cart)
-admin.site.register(CartItem)
+@admin.register(Cart)
+class CartAdmin(admin.ModelAdmin):
+    list_select_related = ['user']
+    raw_id_fields = ['user']
+    show_full_result_count = False
+
+
+@admin.register(CartItem)
+class CartItemAdmin(admin.ModelAdmin):
+    list_select_related = ['cart__user', 'product']
+    raw_id_fields = ['cart']
+    autocomplete_fields = ['product']
+    show_full_result_count = False
+
 
 admin.site.register(CustomerMessage)
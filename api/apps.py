@@ -6,4 +6,9 @@ class ApiConfig(AppConfig):
     name = 'api'
 
     def ready(self):
+        from django.conf import settings
+
         import api.signals
+        if settings.CLOUDINARY_FAKE:
+            from .fake_cloudinary import install
+            install()
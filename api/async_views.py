@@ -0,0 +1,182 @@
+"""
+Native async variants of the catalog and cart endpoints.
+
+These run on the event loop when served through backend.asgi (e.g.
+`gunicorn backend.asgi:application -k uvicorn.workers.UvicornWorker`) and
+use the async ORM and cache APIs, so a request waiting on the database does
+not hold a worker thread. Responses match the DRF views in api.views.
+
+Carts are only handled natively for the database backend. With another
+settings.CART_STORAGE, and for POSTs carrying an Idempotency-Key, the
+cart endpoints hand the request to the DRF views, which go through the
+storage backend and api.idempotency.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.http import JsonResponse
+from django.middleware.csrf import CsrfViewMiddleware
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import require_GET, require_http_methods
+
+from . import cache as catalog_cache
+from . import counters, views
+from .cache import acatalog_version
+from .filters import filter_products
+from .idempotency import HEADER as IDEMPOTENCY_HEADER
+from .models import Cart, CartItem, Product
+from .serializers import (
+    CartItemSerializer,
+    ProductCardSerializer,
+    SingleCartItemSerializer,
+    SingleProductSerializer,
+)
+
+
+DATABASE_CART_STORAGE = 'api.carts.DatabaseCartStorage'
+
+_cart_view = views.CartView.as_view()
+_cart_item_view = views.SingleCartView.as_view()
+
+
+def _native_cart(request):
+    if settings.CART_STORAGE != DATABASE_CART_STORAGE:
+        return False
+    return not (request.method == 'POST' and IDEMPOTENCY_HEADER in request.headers)
+
+
+def _enforce_csrf(request, user):
+    # Same rule as DRF's SessionAuthentication: only session users need it.
+    if not user.is_authenticated:
+        return None
+    check = CsrfViewMiddleware(lambda request: None)
+    check.process_request(request)
+    return check.process_view(request, None, (), {})
+
+
+def _request_data(request):
+    if request.content_type == 'application/json':
+        try:
+            return json.loads(request.body or b'{}')
+        except ValueError:
+            return {}
+    return request.POST
+
+
+async def _product_cards(params):
+    queryset = filter_products(
+        Product.objects.only(*ProductCardSerializer.Meta.fields), params)
+    products = [product async for product in queryset]
+    return list(ProductCardSerializer(products, many=True).data)
+
+
+@require_GET
+async def product_list(request):
+    try:
+        if request.GET:
+            # Filtered lists are served by their index (api.filters), not cached
+            return JsonResponse(await _product_cards(request.GET), safe=False)
+        key = catalog_cache.product_list_key(await acatalog_version())
+        data = await cache.aget(key)
+        if data is None:
+            data = await _product_cards(request.GET)
+            await cache.aset(key, data, catalog_cache.timeout())
+    except ValueError as error:
+        return JsonResponse({'error': str(error)}, status=400)
+    return JsonResponse(data, safe=False)
+
+
+@require_GET
+async def product_detail(request, id):
+    key = catalog_cache.product_key(await acatalog_version(), id)
+    data = await cache.aget(key)
+    if data is None:
+        try:
+            product = await Product.objects.prefetch_related('images').aget(id=id)
+        except Product.DoesNotExist:
+            return JsonResponse({"message": "product is not found"}, status=404)
+        data = dict(SingleProductSerializer(product).data)
+        await cache.aset(key, data, catalog_cache.timeout())
+    counters.record_view(id)
+    return JsonResponse(data)
+
+
+async def _get_cart(request, user):
+    if user.is_authenticated:
+        cart, _ = await Cart.objects.aget_or_create(user=user)
+    else:
+        cart, _ = await Cart.objects.aget_or_create(
+            temporary_user=request.headers.get('X-Temporary-User'))
+    return cart
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST', 'PUT', 'DELETE'])
+async def cart(request):
+    if not _native_cart(request):
+        return await sync_to_async(_cart_view)(request)
+    user = await request.auser()
+    rejected = _enforce_csrf(request, user)
+    if rejected is not None:
+        return rejected
+    cart = await _get_cart(request, user)
+
+    if request.method == 'GET':
+        items = [item async for item in CartItem.objects.filter(
+            cart=cart).select_related('product').prefetch_related('product__images')]
+        return JsonResponse(CartItemSerializer(items, many=True).data, safe=False)
+
+    if request.method == 'DELETE':
+        product_id = request.GET.get('productId')
+        if not product_id:
+            return JsonResponse({'error': 'Product ID is required'}, status=400)
+        if not await Product.objects.filter(id=product_id).aexists():
+            return JsonResponse({'error': 'Product not found'}, status=404)
+        await CartItem.objects.filter(cart=cart, product_id=product_id).adelete()
+        return JsonResponse({'message': 'Item deleted successfully'})
+
+    data = _request_data(request)
+    try:
+        quantity = int(data.get('quantity', 1))
+        product = await Product.objects.aget(id=data.get('productId'))
+    except (TypeError, ValueError, Product.DoesNotExist):
+        return JsonResponse({'detail': 'No Product matches the given query.'}, status=404)
+
+    if quantity < 1:
+        return JsonResponse({'error': 'Quantity must be at least 1'}, status=400)
+
+    if request.method == 'POST':
+        cart_item, created = await CartItem.objects.aget_or_create(
+            cart=cart, product=product, defaults={'quantity': quantity})
+        if not created:
+            cart_item.quantity += quantity
+            await cart_item.asave()
+        counters.record_cart_add(product.id)
+        return JsonResponse({'message': 'Cart item added successfully'}, status=201)
+
+    try:
+        cart_item = await CartItem.objects.aget(cart=cart, product=product)
+    except CartItem.DoesNotExist:
+        return JsonResponse({'detail': 'No CartItem matches the given query.'}, status=404)
+    cart_item.quantity = quantity
+    await cart_item.asave()
+    return JsonResponse({'message': 'Cart item quantity updated'})
+
+
+@require_GET
+async def cart_item(request, id):
+    if not _native_cart(request):
+        return await sync_to_async(_cart_item_view)(request, id=id)
+    user = await request.auser()
+    try:
+        if user.is_authenticated:
+            cart = await Cart.objects.aget(user=user)
+        else:
+            cart = await Cart.objects.aget(
+                temporary_user=request.headers.get('X-Temporary-User'))
+        item = await CartItem.objects.aget(cart=cart, product_id=id)
+    except (Cart.DoesNotExist, Cart.MultipleObjectsReturned, CartItem.DoesNotExist):
+        return JsonResponse({})
+    return JsonResponse(SingleCartItemSerializer(item).data)
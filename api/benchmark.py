@@ -0,0 +1,270 @@
+"""
+Seeding and load generation for the API benchmarks.
+
+Benchmark rows are tagged with BENCH_PREFIX so they can be removed without
+touching real data. Images are stored as plain Cloudinary public ids, so
+seeding never uploads anything; the URLs are still built the same way as
+for real images.
+"""
+import asyncio
+import json
+import random
+import subprocess
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+from django.db.models.signals import post_delete, pre_delete
+
+from .changes import record_changes
+from .models import Cart, CartItem, CatalogChange, Product, ProductImage
+from .projections import refresh_product_cards
+from .query_audit import QueryAudit
+from .signals import delete_image_and_thumbnails, refresh_product_card
+
+BENCH_PREFIX = 'bench'
+BATCH_SIZE = 1000
+
+
+def seed_catalog(products, images_per_product, carts, items_per_cart, seed=0):
+    rng = random.Random(seed)
+    categories = [choice for choice, _ in Product.CATEGORY_CHOICES]
+    with transaction.atomic():
+        product_objs = []
+        for i in range(products):
+            price = rng.randint(500, 50000)
+            product = Product(
+                name=f'{BENCH_PREFIX} product {i}',
+                description=f'Benchmark product {i}',
+                price=price,
+                original_price=price + rng.choice([0, 0, 1000, 5000]),
+                category=rng.choice(categories),
+                stock=rng.randint(0, 50),
+            )
+            product.discount_percentage = product.compute_discount_percentage()
+            product_objs.append(product)
+        product_objs = Product.objects.bulk_create(
+            product_objs, batch_size=BATCH_SIZE)
+
+        images = ProductImage.objects.bulk_create((
+            ProductImage(
+                product=product,
+                image=f'{BENCH_PREFIX}/product_{product.pk}_{j}',
+                alt_text=f'{product.name} image {j}',
+            )
+            for product in product_objs
+            for j in range(images_per_product)
+        ), batch_size=BATCH_SIZE)
+        record_changes(CatalogChange.IMAGE, [image.pk for image in images])
+        for start in range(0, len(product_objs), BATCH_SIZE):
+            refresh_product_cards(
+                [product.pk for product in product_objs[start:start + BATCH_SIZE]])
+
+        cart_objs = Cart.objects.bulk_create(
+            [Cart(temporary_user=f'{BENCH_PREFIX}-{i}') for i in range(carts)],
+            batch_size=BATCH_SIZE)
+
+        items = []
+        for cart in cart_objs:
+            picked = rng.sample(product_objs, min(items_per_cart, len(product_objs)))
+            items.extend(CartItem(cart=cart, product=product,
+                                  quantity=rng.randint(1, 3))
+                         for product in picked)
+        CartItem.objects.bulk_create(items, batch_size=BATCH_SIZE)
+
+
+def clear_catalog():
+    """Delete benchmark rows without the per-image Cloudinary and card signals"""
+    pre_delete.disconnect(delete_image_and_thumbnails, sender=ProductImage)
+    post_delete.disconnect(refresh_product_card, sender=ProductImage)
+    try:
+        with transaction.atomic():
+            Cart.objects.filter(
+                temporary_user__startswith=f'{BENCH_PREFIX}-').delete()
+            Product.objects.filter(
+                name__startswith=f'{BENCH_PREFIX} product ').delete()
+    finally:
+        pre_delete.connect(delete_image_and_thumbnails, sender=ProductImage)
+        post_delete.connect(refresh_product_card, sender=ProductImage)
+
+
+def benchmark_targets():
+    """Endpoint name -> list of (path, headers) to pick requests from"""
+    product_ids = list(Product.objects.filter(
+        name__startswith=f'{BENCH_PREFIX} product ').values_list('id', flat=True))
+    cart_items = list(CartItem.objects.filter(
+        cart__temporary_user__startswith=f'{BENCH_PREFIX}-').values_list(
+        'cart__temporary_user', 'product_id')[:5000])
+    if not product_ids or not cart_items:
+        raise ValueError('No benchmark data, run seed_catalog first')
+    targets = {
+        'products': [('/api/products/', {})],
+        'product': [(f'/api/product/{pk}/', {}) for pk in product_ids],
+        'cart': [('/api/cart/', {'X-Temporary-User': user})
+                 for user, _ in cart_items],
+        'cart_item': [(f'/api/cart/{pk}/', {'X-Temporary-User': user})
+                      for user, pk in cart_items],
+    }
+    for name, requests in list(targets.items()):
+        targets[f'async_{name}'] = [
+            (path.replace('/api/', '/api/async/', 1), headers)
+            for path, headers in requests]
+    return targets
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
+
+
+def summarize(latencies, queries, errors, elapsed):
+    latencies_ms = [value * 1000 for value in latencies]
+    return {
+        'requests': len(latencies),
+        'errors': errors,
+        'p50_ms': _round(percentile(latencies_ms, 50)),
+        'p95_ms': _round(percentile(latencies_ms, 95)),
+        'p99_ms': _round(percentile(latencies_ms, 99)),
+        'mean_ms': _round(sum(latencies_ms) / len(latencies_ms)
+                          if latencies_ms else None),
+        'throughput_rps': _round(len(latencies) / elapsed if elapsed else None),
+        'queries_per_request': _round(sum(queries) / len(queries)
+                                      if queries else None),
+    }
+
+
+def _in_process_fetcher():
+    from django.test import Client
+    client = Client()
+
+    def fetch(path, headers):
+        with QueryAudit() as audit:
+            response = client.get(path, headers=headers)
+        return response.status_code, audit.count
+    return fetch
+
+
+def _http_fetcher(base_url):
+    import requests
+    session = requests.Session()
+
+    def fetch(path, headers):
+        response = session.get(base_url.rstrip('/') + path, headers=headers)
+        return response.status_code, None
+    return fetch
+
+
+def run_endpoint(targets, requests_count, concurrency, base_url=None, seed=0):
+    """Drive one endpoint with `concurrency` client threads"""
+    latencies, queries = [], []
+    errors = 0
+    lock = threading.Lock()
+    per_client = [requests_count // concurrency] * concurrency
+    for i in range(requests_count % concurrency):
+        per_client[i] += 1
+
+    def client_loop(count, client_seed):
+        nonlocal errors
+        rng = random.Random(client_seed)
+        if base_url:
+            fetch = _http_fetcher(base_url)
+        else:
+            fetch = _in_process_fetcher()
+        try:
+            for _ in range(count):
+                path, headers = rng.choice(targets)
+                start = time.perf_counter()
+                status, query_count = fetch(path, headers)
+                duration = time.perf_counter() - start
+                with lock:
+                    latencies.append(duration)
+                    if query_count is not None:
+                        queries.append(query_count)
+                    if status >= 400:
+                        errors += 1
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=client_loop, args=(count, seed + i))
+               for i, count in enumerate(per_client) if count]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(latencies, queries, errors, time.perf_counter() - start)
+
+
+def run_endpoint_asgi(targets, requests_count, concurrency, seed=0):
+    """Drive one endpoint through Django's ASGI handler with `concurrency`
+    requests in flight on a single event loop"""
+    from django.test import AsyncClient
+
+    async def main():
+        client = AsyncClient()
+        rng = random.Random(seed)
+        latencies = []
+        errors = 0
+        slots = asyncio.Semaphore(concurrency)
+
+        async def one():
+            nonlocal errors
+            path, headers = rng.choice(targets)
+            async with slots:
+                start = time.perf_counter()
+                response = await client.get(path, headers=headers)
+                latencies.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(requests_count)))
+        return summarize(latencies, [], errors, time.perf_counter() - start)
+
+    try:
+        return asyncio.run(main())
+    finally:
+        connections.close_all()
+
+
+def current_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'],
+                              capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def build_report(endpoints, requests_count, concurrency, target):
+    return {
+        'commit': current_commit(),
+        'target': target,
+        'database': connection.vendor,
+        'debug': settings.DEBUG,
+        'requests_per_endpoint': requests_count,
+        'concurrency': concurrency,
+        'catalog': {
+            'products': Product.objects.count(),
+            'images': ProductImage.objects.count(),
+            'carts': Cart.objects.count(),
+            'cart_items': CartItem.objects.count(),
+        },
+        'endpoints': endpoints,
+    }
+
+
+def dump_report(report, path=None):
+    text = json.dumps(report, indent=2)
+    if path:
+        with open(path, 'w') as fh:
+            fh.write(text + '\n')
+    return text
@@ -0,0 +1,70 @@
+"""
+Versioned catalog cache keys.
+
+Every product or image change bumps a single catalog version; cached
+product payloads embed the version in their key, so a bump invalidates
+them all without deleting anything. A missing version (first use, or
+evicted) is seeded from the clock rather than 1, so it never comes back to
+a number whose payloads may still be cached.
+
+The bump waits for the writer's transaction to commit: bumped any
+earlier, a concurrent reader could still see the old rows and cache them
+under the new version.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+CATALOG_VERSION_KEY = 'catalog:version'
+
+
+def initial_version():
+    return time.time_ns()
+
+
+def catalog_version():
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        seed = initial_version()
+        cache.add(CATALOG_VERSION_KEY, seed, timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY, seed)
+    return version
+
+
+async def acatalog_version():
+    version = await cache.aget(CATALOG_VERSION_KEY)
+    if version is None:
+        seed = initial_version()
+        await cache.aadd(CATALOG_VERSION_KEY, seed, timeout=None)
+        version = await cache.aget(CATALOG_VERSION_KEY, seed)
+    return version
+
+
+def _bump():
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.add(CATALOG_VERSION_KEY, initial_version(), timeout=None)
+
+
+def bump_catalog_version():
+    """Bump the version once the current transaction commits (now outside one)"""
+    transaction.on_commit(_bump, robust=True)
+
+
+def product_list_key(version):
+    return f'catalog:{version}:products'
+
+
+def product_key(version, product_id):
+    return f'catalog:{version}:product:{product_id}'
+
+
+def related_products_key(version, product_id):
+    return f'catalog:{version}:related:{product_id}'
+
+
+def timeout():
+    return settings.CATALOG_CACHE_TIMEOUT
@@ -0,0 +1,259 @@
+"""
+Cart storage backends used by CartView and SingleCartView.
+
+settings.CART_STORAGE picks the backend:
+
+* DatabaseCartStorage keeps every cart in Cart/CartItem, keyed by the
+  user or the X-Temporary-User header.
+* CookieCartStorage keeps a guest's cart in a signed, compressed cookie
+  of product ids and quantities, so browsing guests never touch the cart
+  tables. The cart moves to the database when it outgrows
+  CART_COOKIE_MAX_ITEMS, after which the cookie only holds the id of that
+  Cart, and is merged into the user's cart when its owner logs in, from
+  the cookie or from that Cart, which is then deleted. Cart lines are
+  identified by their product id on both sides of that move, so `id`
+  stays the same for the client.
+"""
+from django.conf import settings
+from django.core import signing
+from django.http import Http404
+from django.utils.module_loading import import_string
+
+from .models import Cart, CartItem, Product
+from .query_audit import allow_queries
+from .serializers import CartItemSerializer, ProductSerializer, SingleCartItemSerializer
+
+
+def get_cart_storage(request):
+    storage = getattr(request, '_cart_storage', None)
+    if storage is None:
+        storage_class = import_string(settings.CART_STORAGE)
+        storage = request._cart_storage = storage_class(request)
+    return storage
+
+
+class DatabaseCartStorage:
+    def __init__(self, request):
+        self.request = request
+        self.cart = None
+        # 'default' once this request wrote the cart behind a safe method,
+        # so its own reads do not go to a lagging replica
+        self.read_db = None
+
+    def read_from_primary(self):
+        self.read_db = 'default'
+        # ...and neither do the client's next requests (ReplicaRoutingMiddleware)
+        getattr(self.request, '_request', self.request).pin_to_primary = True
+
+    def get_cart(self):
+        if self.cart is None:
+            if self.request.user.is_authenticated:
+                self.cart, _ = Cart.objects.get_or_create(user=self.request.user)
+            else:
+                self.cart, _ = Cart.objects.get_or_create(
+                    temporary_user=self.request.headers.get('X-Temporary-User'))
+        return self.cart
+
+    def find_cart(self):
+        """The existing cart, without creating one"""
+        carts = Cart.objects.using(self.read_db)
+        try:
+            if self.request.user.is_authenticated:
+                return carts.get(user=self.request.user)
+            return carts.get(temporary_user=self.request.headers.get('X-Temporary-User'))
+        except (Cart.DoesNotExist, Cart.MultipleObjectsReturned):
+            return None
+
+    def items(self):
+        cart_items = CartItem.objects.using(self.read_db).filter(
+            cart=self.get_cart()).select_related('product').prefetch_related('product__images')
+        return CartItemSerializer(cart_items, many=True).data
+
+    def item(self, product_id):
+        cart = self.find_cart()
+        if cart is None:
+            return {}
+        try:
+            return SingleCartItemSerializer(CartItem.objects.using(self.read_db).get(
+                cart=cart, product_id=product_id)).data
+        except CartItem.DoesNotExist:
+            return {}
+
+    def add(self, product, quantity):
+        cart_item, created = CartItem.objects.get_or_create(
+            cart=self.get_cart(), product=product, defaults={'quantity': quantity})
+        if not created:
+            cart_item.quantity += quantity
+            cart_item.save()
+
+    def update(self, product, quantity):
+        try:
+            cart_item = CartItem.objects.get(cart=self.get_cart(), product=product)
+        except CartItem.DoesNotExist:
+            raise Http404('No CartItem matches the given query.')
+        cart_item.quantity = quantity
+        cart_item.save()
+
+    def remove(self, product):
+        CartItem.objects.filter(cart=self.get_cart(), product=product).delete()
+
+    def update_response(self, response):
+        pass
+
+
+class CookieCartStorage(DatabaseCartStorage):
+    ITEMS = 'items'
+    CART = 'cart'
+
+    def __init__(self, request):
+        super().__init__(request)
+        self.state = self.load()
+        self.changed = False
+
+    def load(self):
+        value = self.request.COOKIES.get(settings.CART_COOKIE_NAME)
+        if not value:
+            return {}
+        try:
+            state = signing.loads(value, salt=settings.CART_COOKIE_SALT,
+                                  max_age=settings.CART_COOKIE_MAX_AGE)
+        except signing.BadSignature:
+            return {}
+        return state if isinstance(state, dict) else {}
+
+    @property
+    def cookie_items(self):
+        """{product id: quantity} of a cart still kept in the cookie"""
+        return {int(pk): quantity for pk, quantity in self.state.get(self.ITEMS, [])}
+
+    def set_cookie_items(self, items):
+        self.state = {}
+        if items:
+            self.state[self.ITEMS] = [[pk, quantity] for pk, quantity in items.items()]
+        self.changed = True
+
+    def in_database(self):
+        if self.request.user.is_authenticated:
+            if self.state.get(self.ITEMS):
+                self.promote(self.get_cart())
+            elif self.CART in self.state:
+                self.adopt(self.get_cart())
+            return True
+        return self.CART in self.state
+
+    def get_cart(self):
+        if self.request.user.is_authenticated or self.CART not in self.state:
+            return super().get_cart()
+        # From the primary: a lagging replica would make this create a new cart
+        cart = Cart.objects.using('default').filter(pk=self.state[self.CART]).first()
+        if cart is None:
+            cart = Cart.objects.create(
+                temporary_user=self.request.headers.get('X-Temporary-User'))
+            self.state = {self.CART: cart.pk}
+            self.changed = True
+        return cart
+
+    def find_cart(self):
+        if self.request.user.is_authenticated:
+            return super().find_cart()
+        return Cart.objects.using(self.read_db).filter(pk=self.state[self.CART]).first()
+
+    def merge(self, cart, items):
+        """Add {product id: quantity} `items` to what `cart` already holds"""
+        existing = {item.product_id: item for item in CartItem.objects.using('default').filter(
+            cart=cart, product_id__in=items)}
+        for cart_item in existing.values():
+            cart_item.quantity += items[cart_item.product_id]
+        CartItem.objects.bulk_update(existing.values(), ['quantity'])
+        known = set(Product.objects.using('default').filter(
+            id__in=set(items) - set(existing)).values_list('id', flat=True))
+        CartItem.objects.bulk_create(
+            CartItem(cart=cart, product_id=pk, quantity=items[pk]) for pk in known)
+
+    def promote(self, cart):
+        """Move the cookie items into `cart`"""
+        # select items, select products, bulk_update, bulk_create
+        allow_queries(self.request, 4)
+        self.merge(cart, self.cookie_items)
+        self.state = {} if self.request.user.is_authenticated else {self.CART: cart.pk}
+        self.changed = True
+        self.read_from_primary()
+
+    def adopt(self, cart):
+        """Move the guest cart the cookie points at into the user's `cart`"""
+        # select the guest cart and its items, the merge, delete both
+        allow_queries(self.request, 8)
+        guest = Cart.objects.using('default').filter(
+            pk=self.state[self.CART], user=None).exclude(pk=cart.pk).first()
+        if guest is not None:
+            self.merge(cart, dict(CartItem.objects.using('default').filter(
+                cart=guest).values_list('product_id', 'quantity')))
+            guest.delete()
+        self.state = {}
+        self.changed = True
+        self.read_from_primary()
+
+    def items(self):
+        if self.in_database():
+            return [dict(item, id=item['product']['id']) for item in super().items()]
+        items = self.cookie_items
+        if not items:
+            return []
+        products = {product.id: product for product in Product.objects.filter(
+            id__in=items).prefetch_related('images')}
+        if len(products) < len(items):
+            # Forget products that have been deleted since
+            self.set_cookie_items({pk: items[pk] for pk in items if pk in products})
+        return [
+            {'id': pk, 'product': ProductSerializer(products[pk]).data, 'quantity': quantity}
+            for pk, quantity in items.items() if pk in products
+        ]
+
+    def item(self, product_id):
+        if self.in_database():
+            quantity = super().item(product_id).get('quantity')
+        else:
+            quantity = self.cookie_items.get(int(product_id))
+        return {'id': int(product_id), 'quantity': quantity} if quantity else {}
+
+    def add(self, product, quantity):
+        if self.in_database():
+            return super().add(product, quantity)
+        items = self.cookie_items
+        items[product.id] = items.get(product.id, 0) + quantity
+        self.set_cookie_items(items)
+        if len(items) > settings.CART_COOKIE_MAX_ITEMS:
+            self.promote(Cart.objects.create(
+                temporary_user=self.request.headers.get('X-Temporary-User')))
+
+    def update(self, product, quantity):
+        if self.in_database():
+            return super().update(product, quantity)
+        items = self.cookie_items
+        if product.id not in items:
+            raise Http404('No CartItem matches the given query.')
+        items[product.id] = quantity
+        self.set_cookie_items(items)
+
+    def remove(self, product):
+        if self.in_database():
+            return super().remove(product)
+        items = self.cookie_items
+        items.pop(product.id, None)
+        self.set_cookie_items(items)
+
+    def update_response(self, response):
+        if not self.changed:
+            return
+        if not self.state:
+            response.delete_cookie(
+                settings.CART_COOKIE_NAME, samesite=settings.CART_COOKIE_SAMESITE)
+            return
+        response.set_cookie(
+            settings.CART_COOKIE_NAME,
+            signing.dumps(self.state, salt=settings.CART_COOKIE_SALT, compress=True),
+            max_age=settings.CART_COOKIE_MAX_AGE,
+            secure=settings.CART_COOKIE_SECURE,
+            httponly=True,
+            samesite=settings.CART_COOKIE_SAMESITE,
+        )
@@ -0,0 +1,123 @@
+"""
+Buffered product popularity counters.
+
+Product views and add-to-cart events are counted in process memory and
+written every POPULARITY_FLUSH_INTERVAL seconds as one UPDATE for all the
+touched products, instead of an UPDATE per request on the hottest rows.
+Flushes add deltas, so every worker process can buffer on its own; a
+process that dies loses at most one interval of counts.
+
+Product.popularity is views plus POPULARITY_CART_WEIGHT per cart add, and
+is indexed for `GET /api/products/?sort=popular`.
+"""
+import atexit
+import logging
+import os
+import threading
+import time
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import connection, connections
+from django.db.models import Case, F, IntegerField, Value, When
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+VIEWS = 0
+CART_ADDS = 1
+FLUSH_BATCH_SIZE = 500
+
+_pending = defaultdict(lambda: [0, 0])
+_lock = threading.Lock()
+_flusher_pid = None
+
+
+def record_view(product_id):
+    _record(product_id, VIEWS)
+
+
+def record_cart_add(product_id):
+    _record(product_id, CART_ADDS)
+
+
+def _record(product_id, counter):
+    if not settings.POPULARITY_COUNTERS_ENABLED:
+        return
+    with _lock:
+        _pending[int(product_id)][counter] += 1
+    _ensure_flusher()
+
+
+def _ensure_flusher():
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    threading.Thread(target=_flush_forever, name='popularity-flush', daemon=True).start()
+
+
+def _flush_forever():
+    while True:
+        time.sleep(settings.POPULARITY_FLUSH_INTERVAL)
+        try:
+            flush()
+        except Exception:
+            logger.exception('Popularity counter flush failed')
+        finally:
+            connections.close_all()
+
+
+def _take_pending():
+    global _pending
+    with _lock:
+        pending, _pending = _pending, defaultdict(lambda: [0, 0])
+    return [(product_id, views, adds) for product_id, (views, adds) in pending.items()]
+
+
+def flush():
+    """Write the buffered counts, returning how many products were updated"""
+    rows = _take_pending()
+    if not rows:
+        return 0
+    weight = settings.POPULARITY_CART_WEIGHT
+    write = _flush_values if connection.vendor == 'postgresql' else _flush_case
+    for start in range(0, len(rows), FLUSH_BATCH_SIZE):
+        write(rows[start:start + FLUSH_BATCH_SIZE], weight)
+    return len(rows)
+
+
+def _flush_values(rows, weight):
+    table = connection.ops.quote_name(Product._meta.db_table)
+    values = ', '.join(['(%s::bigint, %s::integer, %s::integer)'] * len(rows))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {table} SET view_count = {table}.view_count + v.views, '
+            f'cart_add_count = {table}.cart_add_count + v.adds, '
+            f'popularity = {table}.popularity + v.views + v.adds * %s '
+            f'FROM (VALUES {values}) AS v(id, views, adds) WHERE {table}.id = v.id',
+            [weight, *[value for row in rows for value in row]])
+
+
+def _flush_case(rows, weight):
+    def delta(value_of):
+        return Case(*[When(pk=row[0], then=Value(value_of(row))) for row in rows],
+                    default=Value(0), output_field=IntegerField())
+
+    Product.objects.filter(pk__in=[row[0] for row in rows]).update(
+        view_count=F('view_count') + delta(lambda row: row[1]),
+        cart_add_count=F('cart_add_count') + delta(lambda row: row[2]),
+        popularity=F('popularity') + delta(lambda row: row[1] + row[2] * weight),
+    )
+
+
+@atexit.register
+def _flush_at_exit():
+    try:
+        flush()
+    except Exception:
+        logger.exception('Popularity counter flush at exit failed')
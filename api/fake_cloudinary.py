@@ -0,0 +1,100 @@
+"""
+In-process stand-in for Cloudinary, used by the local and test settings
+(CLOUDINARY_FAKE).
+
+install() points the SDK calls this project makes (uploads, including
+CloudinaryField form uploads, destroy, explicit and derived resource
+deletion) at a dictionary in memory, so images can be uploaded, analyzed
+and deleted without credentials or network. URLs are still built by the
+real SDK, they just point at a cloud that does not exist.
+"""
+import io
+import threading
+import uuid
+import zlib
+
+_files = {}
+_lock = threading.Lock()
+
+
+def _read(file):
+    if isinstance(file, (bytes, bytearray)):
+        return bytes(file)
+    if isinstance(file, str):
+        with open(file, 'rb') as fh:
+            return fh.read()
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    return file.read()
+
+
+def upload(file, **options):
+    from PIL import Image
+
+    content = _read(file)
+    public_id = options.get('public_id') or uuid.uuid4().hex
+    result = {
+        'public_id': public_id,
+        'version': 1,
+        'type': options.get('type', 'upload'),
+        'resource_type': options.get('resource_type', 'image'),
+        'bytes': len(content),
+    }
+    try:
+        with Image.open(io.BytesIO(content)) as img:
+            result.update(format=(img.format or '').lower(),
+                          width=img.width, height=img.height)
+    except Exception:
+        pass
+    with _lock:
+        _files[public_id] = content
+    return result
+
+
+def open_image(image):
+    """IMAGE_PLACEHOLDER_OPENER for fake images; unknown ids (e.g. seeded
+    benchmark rows) get a small solid image derived from the id."""
+    from PIL import Image
+
+    public_id = image.image.public_id
+    with _lock:
+        content = _files.get(public_id)
+    if content is not None:
+        return io.BytesIO(content)
+    seed = zlib.crc32(public_id.encode())
+    color = (seed & 0xff, seed >> 8 & 0xff, seed >> 16 & 0xff)
+    buffer = io.BytesIO()
+    Image.new('RGB', (640, 640), color).save(buffer, 'JPEG')
+    buffer.seek(0)
+    return buffer
+
+
+def destroy(public_id, **options):
+    with _lock:
+        found = _files.pop(public_id, None) is not None
+    return {'result': 'ok' if found else 'not found'}
+
+
+def explicit(public_id, **options):
+    return {'public_id': public_id, 'type': options.get('type', 'upload'),
+            'eager': options.get('eager') or []}
+
+
+def delete_derived_resources(derived_resource_ids, **options):
+    return {'deleted': {}}
+
+
+def clear():
+    with _lock:
+        _files.clear()
+
+
+def install():
+    import cloudinary.api
+    import cloudinary.uploader
+
+    cloudinary.uploader.upload = upload
+    cloudinary.uploader.upload_large = upload
+    cloudinary.uploader.destroy = destroy
+    cloudinary.uploader.explicit = explicit
+    cloudinary.api.delete_derived_resources = delete_derived_resources
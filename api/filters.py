@@ -0,0 +1,76 @@
+"""
+Server-side ordering and filtering of the product list.
+
+    ?ordering=price|-price|discount|newest|popular
+    ?on_sale=true      original price above the current price
+    ?category=Women
+
+Every combination is backed by an index on Product (see its Meta);
+api.tests checks the plans of PLAN_CASES and explain_catalog prints them
+against a real database.
+"""
+import re
+
+from django.db.models import F
+
+from .models import Product
+
+ORDERINGS = {
+    'price': ['price', 'id'],
+    '-price': ['-price', '-id'],
+    'discount': ['-discount_percentage', '-id'],
+    'newest': ['-id'],
+    'popular': ['-popularity', '-id'],
+}
+TRUE_VALUES = ('1', 'true', 'yes')
+
+# Query strings whose plans must be served by an index
+PLAN_CASES = [{'ordering': ordering} for ordering in ORDERINGS] + [
+    {'ordering': 'price', 'category': 'Women'},
+    {'ordering': '-price', 'category': 'Women'},
+    {'on_sale': 'true'},
+    {'on_sale': 'true', 'ordering': 'discount'},
+]
+# Plan lines meaning rows are sorted after reading, or the whole table is
+# read to filter it
+SORTED = {
+    'sqlite': r'USE TEMP B-TREE FOR ORDER BY',
+    'postgresql': r'Sort Key',
+}
+FULL_SCAN = {
+    'sqlite': r'SCAN api_product$',
+    'postgresql': r'Seq Scan on api_product',
+}
+
+
+def filter_products(queryset, params):
+    """
+    Apply the ordering and filters in the query dict `params`. Raises
+    ValueError with a message for the client on unknown values.
+    """
+    # ?sort=popular predates ?ordering=
+    ordering = params.get('ordering') or params.get('sort')
+    if ordering:
+        if ordering not in ORDERINGS:
+            raise ValueError(f"ordering must be one of {', '.join(ORDERINGS)}")
+        queryset = queryset.order_by(*ORDERINGS[ordering])
+
+    category = params.get('category')
+    if category:
+        if category not in dict(Product.CATEGORY_CHOICES):
+            raise ValueError(f"Unknown category {category}")
+        queryset = queryset.filter(category=category)
+
+    if params.get('on_sale', '').lower() in TRUE_VALUES:
+        queryset = queryset.filter(original_price__gt=F('price'))
+    return queryset
+
+
+def uses_index(plan, params, vendor):
+    """Whether `plan` sorts and, for filtered `params`, finds rows by index"""
+    sorted_pattern = SORTED.get(vendor)
+    if sorted_pattern and re.search(sorted_pattern, plan, re.MULTILINE):
+        return False
+    scan_pattern = FULL_SCAN.get(vendor)
+    filtered = set(params) - {'ordering'}
+    return not (filtered and scan_pattern and re.search(scan_pattern, plan, re.MULTILINE))
@@ -0,0 +1,29 @@
+from django import forms
+
+from .models import Product
+
+
+class MultipleFileInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+
+class MultipleFileField(forms.FileField):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', MultipleFileInput())
+        super().__init__(*args, **kwargs)
+
+    def clean(self, data, initial=None):
+        single_file_clean = super().clean
+        if isinstance(data, (list, tuple)):
+            return [single_file_clean(item, initial) for item in data]
+        return [single_file_clean(data, initial)] if data else []
+
+
+class ProductAdminForm(forms.ModelForm):
+    bulk_images = MultipleFileField(
+        required=False,
+        help_text="Select several images to upload them in parallel")
+
+    class Meta:
+        model = Product
+        fields = '__all__'
@@ -0,0 +1,116 @@
+"""
+Idempotency-Key support for retried POSTs.
+
+A client that may retry a request sends the same `Idempotency-Key`
+header with every attempt. The first attempt runs the view and its
+response (status, data and cookies) is kept in the default cache for
+IDEMPOTENCY_TTL seconds; later attempts get that response back with an
+`Idempotent-Replayed: true` header instead of running the view again.
+Cookies are not part of what is kept: a replay goes through the view's
+finalize_response like any response, so the cart cookie (api.carts) it
+carries, if any, reflects the cart as it is now rather than as it was.
+
+Attempts that arrive while the first one is still running wait for its
+result rather than racing it, so only one of them reaches the database.
+Keys are scoped to the client (X-Temporary-User, user, session, cart
+cookie or, failing all of those, address) and the path, and reusing a key with a different body is rejected. Server
+errors are not stored, so a retry after one runs the view again.
+"""
+import functools
+import hashlib
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.05
+
+
+def _client(request):
+    client = request.headers.get('X-Temporary-User')
+    if client:
+        return client
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    session = getattr(request, 'session', None)
+    if session is not None and session.session_key:
+        return f'session:{session.session_key}'
+    cart = request.COOKIES.get(settings.CART_COOKIE_NAME)
+    if cart:
+        return f'cart:{cart}'
+    return f"addr:{request.META.get('REMOTE_ADDR')}"
+
+
+def _cache_key(request, key):
+    scope = '\n'.join([_client(request), request.method, request.get_full_path(), key])
+    return 'idempotency:' + hashlib.sha256(scope.encode()).hexdigest()
+
+
+def _fingerprint(request):
+    data = request.data
+    if hasattr(data, 'lists'):
+        data = sorted(data.lists())
+    body = json.dumps(data, sort_keys=True, default=str)
+    return hashlib.sha256(body.encode()).hexdigest()
+
+
+def _replay(entry, fingerprint):
+    if entry['fingerprint'] != fingerprint:
+        return Response(
+            {'error': f'{HEADER} was already used for a different request'},
+            status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+    response = Response(entry['data'], status=entry['status'])
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(handler):
+    """Make an APIView handler honour the Idempotency-Key header"""
+
+    @functools.wraps(handler)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if not key:
+            return handler(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'error': f'{HEADER} must be at most {MAX_KEY_LENGTH} characters'},
+                status=status.HTTP_400_BAD_REQUEST)
+
+        cache_key = _cache_key(request, key)
+        lock_key = cache_key + ':lock'
+        fingerprint = _fingerprint(request)
+        deadline = time.monotonic() + settings.IDEMPOTENCY_LOCK_SECONDS
+
+        while not cache.add(lock_key, True, settings.IDEMPOTENCY_LOCK_SECONDS):
+            # Another attempt is running: wait for the response it stores
+            entry = cache.get(cache_key)
+            if entry is not None:
+                return _replay(entry, fingerprint)
+            if time.monotonic() > deadline:
+                return Response(
+                    {'error': f'A request with this {HEADER} is still in progress'},
+                    status=status.HTTP_409_CONFLICT)
+            time.sleep(POLL_INTERVAL)
+
+        try:
+            entry = cache.get(cache_key)
+            if entry is not None:
+                return _replay(entry, fingerprint)
+            response = handler(self, request, *args, **kwargs)
+            if response.status_code < 500:
+                cache.set(cache_key, {
+                    'fingerprint': fingerprint,
+                    'status': response.status_code,
+                    'data': response.data,
+                }, settings.IDEMPOTENCY_TTL)
+            return response
+        finally:
+            cache.delete(lock_key)
+
+    return wrapper
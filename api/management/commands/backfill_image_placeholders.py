@@ -0,0 +1,33 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.models import ProductImage
+from api.placeholders import _fill_in_background
+
+
+class Command(BaseCommand):
+    help = ("Compute dimensions, dominant colour and blurred placeholder for "
+            "product images that do not have them yet")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true',
+                            help="Recompute images that already have a placeholder")
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--workers', type=int,
+                            default=settings.IMAGE_PLACEHOLDER_WORKERS)
+
+    def handle(self, *args, **options):
+        images = ProductImage.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            images = images.filter(placeholder='')
+        ids = list(images.order_by('id').values_list('id', flat=True))
+        size = options['batch_size']
+        batches = [ids[start:start + size] for start in range(0, len(ids), size)]
+
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            done = sum(len(filled) for filled in pool.map(_fill_in_background, batches))
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Filled in {done} of {len(ids)} image placeholders"))
@@ -0,0 +1,72 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import setup_test_environment, teardown_test_environment
+
+from api.benchmark import (
+    benchmark_targets,
+    build_report,
+    dump_report,
+    run_endpoint,
+    run_endpoint_asgi,
+)
+
+
+class Command(BaseCommand):
+    help = ("Benchmark the public API against seeded data and print "
+            "latency, throughput and queries per request as JSON")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500,
+                            help="Requests per endpoint")
+        parser.add_argument('--concurrency', type=int, default=8)
+        parser.add_argument('--endpoints', nargs='+',
+                            default=['products', 'product', 'cart', 'cart_item'],
+                            help="Prefix a name with async_ for the native async "
+                                 "variant, e.g. async_products")
+        parser.add_argument('--base-url',
+                            help="Benchmark a running server instead of in-process "
+                                 "(queries per request are not reported)")
+        parser.add_argument('--asgi', action='store_true',
+                            help="Serve in-process requests through the ASGI handler "
+                                 "from one event loop instead of WSGI threads")
+        parser.add_argument('--warmup', type=int, default=20,
+                            help="Unmeasured requests per endpoint")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help="Also write the JSON report here")
+
+    def handle(self, *args, **options):
+        try:
+            targets = benchmark_targets()
+        except ValueError as exc:
+            raise CommandError(exc)
+        unknown = set(options['endpoints']) - set(targets)
+        if unknown:
+            raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+
+        if options['base_url']:
+            target = options['base_url']
+        else:
+            target = 'in-process asgi' if options['asgi'] else 'in-process wsgi'
+            setup_test_environment()
+        try:
+            results = {}
+            for name in options['endpoints']:
+                if options['asgi'] and not options['base_url']:
+                    if options['warmup']:
+                        run_endpoint_asgi(targets[name], options['warmup'], 1)
+                    results[name] = run_endpoint_asgi(
+                        targets[name], options['requests'], options['concurrency'],
+                        seed=options['seed'])
+                    continue
+                if options['warmup']:
+                    run_endpoint(targets[name], options['warmup'], 1,
+                                 base_url=options['base_url'])
+                results[name] = run_endpoint(
+                    targets[name], options['requests'], options['concurrency'],
+                    base_url=options['base_url'], seed=options['seed'])
+        finally:
+            if not options['base_url']:
+                teardown_test_environment()
+
+        report = build_report(results, options['requests'],
+                              options['concurrency'], target)
+        self.stdout.write(dump_report(report, options['output']))
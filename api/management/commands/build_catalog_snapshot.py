@@ -0,0 +1,12 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from api.snapshots import build_snapshot
+
+
+class Command(BaseCommand):
+    help = "Render the static catalog snapshot files now"
+
+    def handle(self, *args, **options):
+        self.stdout.write(json.dumps(build_snapshot(), indent=2))
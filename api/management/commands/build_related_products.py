@@ -0,0 +1,32 @@
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.recommendations import build_related_products
+
+
+class Command(BaseCommand):
+    help = ("Recompute the \"frequently bought together\" products from cart "
+            "contents; run it periodically, e.g. nightly")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=settings.RELATED_PRODUCTS_TOP_K,
+                            help="Related products kept per product")
+        parser.add_argument('--min-count', type=int,
+                            default=settings.RELATED_PRODUCTS_MIN_COUNT,
+                            help="Carts a pair must share to be recommended")
+        parser.add_argument('--max-cart-size', type=int,
+                            default=settings.RELATED_PRODUCTS_MAX_CART_SIZE,
+                            help="Ignore carts with more distinct products than this")
+        parser.add_argument('--chunk-size', type=int, default=5000,
+                            help="Cart items fetched per database round trip")
+
+    def handle(self, *args, **options):
+        start = time.perf_counter()
+        products, rows = build_related_products(
+            top_k=options['top'], min_count=options['min_count'],
+            max_cart_size=options['max_cart_size'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Stored {rows} related products for {products} products "
+            f"in {time.perf_counter() - start:.1f}s"))
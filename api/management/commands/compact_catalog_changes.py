@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.changes import compact_changes
+
+
+class Command(BaseCommand):
+    help = "Drop catalog change log entries superseded by a newer entry for the same object"
+
+    def handle(self, *args, **options):
+        deleted = compact_changes()
+        self.stdout.write(self.style.SUCCESS(f"Removed {deleted} superseded changes"))
@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+from api.filters import PLAN_CASES, filter_products, uses_index
+from api.models import Product
+from api.serializers import ProductCardSerializer
+
+
+class Command(BaseCommand):
+    help = ("Print the query plan of every product list ordering and filter "
+            "and check that each one is served by an index")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true',
+                            help="Exit with an error if a plan sorts or scans the table")
+
+    def handle(self, *args, **options):
+        if connection.vendor == 'postgresql':
+            # Small tables make any plan cheap; ask whether an index *can* serve it
+            with connection.cursor() as cursor:
+                cursor.execute('SET enable_seqscan = off')
+
+        failures = []
+        for params in PLAN_CASES:
+            label = '&'.join(f'{key}={value}' for key, value in params.items())
+            queryset = filter_products(
+                Product.objects.only(*ProductCardSerializer.Meta.fields), params)
+            plan = queryset.explain()
+            self.stdout.write(self.style.MIGRATE_HEADING(f'?{label}'))
+            self.stdout.write(plan)
+            if not uses_index(plan, params, connection.vendor):
+                failures.append(label)
+
+        if failures:
+            message = f"No index used for: {', '.join(failures)}"
+            if options['check']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS("Every ordering and filter uses an index"))
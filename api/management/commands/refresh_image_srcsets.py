@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+
+from api.cache import bump_catalog_version
+from api.changes import record_changes
+from api.models import CatalogChange, ProductImage
+from api.variants import build_srcset, request_eager
+
+
+class Command(BaseCommand):
+    help = ("Rebuild the stored srcset of every product image from "
+            "settings.IMAGE_VARIANTS, e.g. after changing the variants")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--eager', action='store_true',
+                            help="Also ask Cloudinary to derive the eager variants now")
+
+    def handle(self, *args, **options):
+        images = ProductImage.objects.only('id', 'image', 'srcset').order_by('id')
+        changed, batch = [], []
+        for image in images.iterator(chunk_size=options['batch_size']):
+            if not image.image:
+                continue
+            if options['eager']:
+                request_eager(image.image.public_id)
+            srcset = build_srcset(image.image)
+            if srcset == image.srcset:
+                continue
+            image.srcset = srcset
+            batch.append(image)
+            if len(batch) >= options['batch_size']:
+                changed += self.save(batch)
+                batch = []
+        changed += self.save(batch)
+
+        if changed:
+            record_changes(CatalogChange.IMAGE, changed)
+            bump_catalog_version()
+        self.stdout.write(self.style.SUCCESS(f"Updated {len(changed)} image srcsets"))
+
+    def save(self, images):
+        ProductImage.objects.bulk_update(images, ['srcset'])
+        return [image.pk for image in images]
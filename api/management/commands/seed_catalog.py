@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from api.benchmark import clear_catalog, seed_catalog
+
+
+class Command(BaseCommand):
+    help = "Seed benchmark products, images and carts (no Cloudinary uploads)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=1000)
+        parser.add_argument('--images', type=int, default=3,
+                            help="Images per product")
+        parser.add_argument('--carts', type=int, default=500)
+        parser.add_argument('--items', type=int, default=4,
+                            help="Items per cart")
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--clear', action='store_true',
+                            help="Remove previously seeded benchmark rows first")
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            clear_catalog()
+        seed_catalog(options['products'], options['images'],
+                     options['carts'], options['items'], seed=options['seed'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Seeded {options['products']} products, "
+            f"{options['products'] * options['images']} images and "
+            f"{options['carts']} carts"))
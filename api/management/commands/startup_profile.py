@@ -0,0 +1,98 @@
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.benchmark import current_commit
+
+# What a web worker does before serving its first request.
+BOOT_SNIPPET = (
+    "import django; django.setup(); "
+    "from django.core.handlers.wsgi import WSGIHandler; WSGIHandler(); "
+    "from django.urls import get_resolver; get_resolver().url_patterns"
+)
+IMPORTTIME_LINE = re.compile(r'import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)')
+
+
+class Command(BaseCommand):
+    help = ("Profile web worker startup: per-module import times from "
+            "`python -X importtime` and wall-clock boot time over several runs")
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top', type=int, default=25,
+                            help="Modules to list, by cumulative import time")
+        parser.add_argument('--repeat', type=int, default=5,
+                            help="Fresh interpreter boots to time")
+        parser.add_argument('--json', action='store_true',
+                            help="Print the report as JSON")
+        parser.add_argument('--record',
+                            help="Append the report as a JSON line to this file "
+                                 "to track startup over time")
+
+    def boot(self, *flags):
+        env = dict(os.environ)
+        env.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings.production')
+        start = time.perf_counter()
+        result = subprocess.run([sys.executable, *flags, '-c', BOOT_SNIPPET],
+                                capture_output=True, text=True, env=env)
+        elapsed = time.perf_counter() - start
+        if result.returncode:
+            raise CommandError(result.stderr.strip().splitlines()[-1])
+        return elapsed, result.stderr
+
+    def import_times(self):
+        _, stderr = self.boot('-X', 'importtime')
+        modules, packages = [], {}
+        for line in stderr.splitlines():
+            match = IMPORTTIME_LINE.match(line)
+            if not match:
+                continue
+            self_us, cumulative_us, _, name = match.groups()
+            modules.append({'module': name, 'self_ms': int(self_us) / 1000,
+                            'cumulative_ms': int(cumulative_us) / 1000})
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0) + int(self_us) / 1000
+        return modules, packages
+
+    def handle(self, *args, **options):
+        modules, packages = self.import_times()
+        boots = [self.boot()[0] * 1000 for _ in range(options['repeat'])]
+        report = {
+            'commit': current_commit(),
+            'recorded_at': datetime.now(timezone.utc).isoformat(),
+            'boot_ms': {
+                'median': round(statistics.median(boots), 1) if boots else None,
+                'min': round(min(boots), 1) if boots else None,
+                'runs': len(boots),
+            },
+            'import_ms': round(sum(packages.values()), 1),
+            'top_packages': [
+                {'package': name, 'self_ms': round(ms, 1)}
+                for name, ms in sorted(packages.items(), key=lambda item: -item[1])[:options['top']]
+            ],
+            'top_modules': sorted(modules, key=lambda m: -m['cumulative_ms'])[:options['top']],
+        }
+
+        if options['record']:
+            with open(options['record'], 'a') as fh:
+                fh.write(json.dumps({key: report[key] for key in (
+                    'commit', 'recorded_at', 'boot_ms', 'import_ms', 'top_packages')}) + '\n')
+
+        if options['json']:
+            self.stdout.write(json.dumps(report, indent=2))
+            return
+        boot = report['boot_ms']
+        self.stdout.write(f"Boot: median {boot['median']} ms, min {boot['min']} ms "
+                          f"over {boot['runs']} runs; imports {report['import_ms']} ms")
+        self.stdout.write("\nPackages by own import time:")
+        for row in report['top_packages']:
+            self.stdout.write(f"  {row['self_ms']:9.1f} ms  {row['package']}")
+        self.stdout.write("\nModules by cumulative import time:")
+        for row in report['top_modules']:
+            self.stdout.write(f"  {row['cumulative_ms']:9.1f} ms  {row['module']}")
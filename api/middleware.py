@@ -0,0 +1,163 @@
+import os
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from whitenoise.middleware import WhiteNoiseMiddleware
+
+from backend.routers import read_from_replicas, replica_aliases
+
+from .query_audit import QueryAudit, budget_for
+
+
+class QueryAuditMiddleware:
+    """Audit the queries of each request, see api.query_audit"""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.QUERY_AUDIT_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with QueryAudit(label=request.path) as audit:
+            request.query_audit = audit
+            response = self.get_response(request)
+        audit.report()
+        return response
+
+    async def __acall__(self, request):
+        # The async ORM runs queries on the request's sync thread, whose
+        # connections are the ones that need the execute wrapper
+        audit = QueryAudit(label=request.path)
+        await sync_to_async(audit.__enter__)()
+        request.query_audit = audit
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(audit.__exit__)(None, None, None)
+        audit.report()
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        audit = getattr(request, 'query_audit', None)
+        view_class = getattr(view_func, 'view_class', None)
+        if audit is None or view_class is None:
+            return None
+        audit.label = f'{view_class.__module__}.{view_class.__name__}.{request.method.lower()}'
+        audit.budget = budget_for(view_class, request.method)
+        return None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Send safe-method requests to the read replicas, except for clients that
+    wrote recently: any unsafe request, or safe one that set
+    `request.pin_to_primary` because it wrote anyway, pins its client
+    (X-Temporary-User, user or address) to the primary for
+    REPLICA_PIN_SECONDS so it reads its own writes. Pins live in the default cache, which must be shared
+    between workers for pinning to hold across processes.
+    """
+    SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not replica_aliases():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def pin_key(self, request):
+        client = request.headers.get('X-Temporary-User')
+        if not client and request.user.is_authenticated:
+            client = f'user:{request.user.pk}'
+        if not client:
+            client = f"addr:{request.META.get('REMOTE_ADDR')}"
+        return f'replica-pin:{client}'
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        key = self.pin_key(request)
+        safe = request.method in self.SAFE_METHODS
+        with read_from_replicas(safe and not cache.get(key)):
+            response = self.get_response(request)
+        if not safe or getattr(request, 'pin_to_primary', False):
+            cache.set(key, True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+    async def __acall__(self, request):
+        key = await sync_to_async(self.pin_key)(request)
+        safe = request.method in self.SAFE_METHODS
+        with read_from_replicas(safe and not await cache.aget(key)):
+            response = await self.get_response(request)
+        if not safe or getattr(request, 'pin_to_primary', False):
+            await cache.aset(key, True, settings.REPLICA_PIN_SECONDS)
+        return response
+
+
+class StaticFilesMiddleware(WhiteNoiseMiddleware):
+    """
+    WhiteNoise that also runs natively under ASGI. The stock middleware is
+    sync only, which forces Django to run every async view in a thread.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response=None, settings=settings):
+        super().__init__(get_response, settings)
+        self.snapshot_root = settings.CATALOG_SNAPSHOT_ROOT
+        self.snapshot_prefix = settings.CATALOG_SNAPSHOT_URL
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def find_static_file(self, request):
+        if self.autorefresh:
+            static_file = self.find_file(request.path_info)
+        else:
+            static_file = self.files.get(request.path_info)
+        if static_file is None:
+            static_file = self.find_snapshot_file(request.path_info)
+        return static_file
+
+    def find_snapshot_file(self, url):
+        """
+        Catalog snapshots (api.snapshots) appear and get pruned after
+        startup, so they are looked up on disk instead of being indexed.
+        """
+        if not url.startswith(self.snapshot_prefix):
+            return None
+        name = url[len(self.snapshot_prefix):]
+        if not name.endswith('.json') or '/' in name or name.startswith('.'):
+            return None
+        path = os.path.join(self.snapshot_root, name)
+        if not os.path.isfile(path):
+            return None
+        return self.get_static_file(path, url)
+
+    def immutable_file_test(self, path, url):
+        if url.startswith(self.snapshot_prefix):
+            return url.count('.') == 2
+        return super().immutable_file_test(path, url)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        static_file = self.find_static_file(request)
+        if static_file is not None:
+            return self.serve(static_file, request)
+        return self.get_response(request)
+
+    async def __acall__(self, request):
+        static_file = self.find_static_file(request)
+        if static_file is not None:
+            return await sync_to_async(self.serve)(static_file, request)
+        return await self.get_response(request)
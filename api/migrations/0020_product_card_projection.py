@@ -0,0 +1,54 @@
+# Generated by Django 5.1.7 on 2026-10-19 12:06
+
+from django.db import migrations, models
+
+
+def backfill_cards(apps, schema_editor):
+    Product = apps.get_model('api', 'Product')
+    ProductImage = apps.get_model('api', 'ProductImage')
+    batch = []
+    for product in Product.objects.iterator(chunk_size=500):
+        images = ProductImage.objects.filter(
+            product=product).order_by('-created_at', '-id')
+        cover = images.first()
+        product.image_count = images.count()
+        product.cover_image_url = cover.image.build_url(transformation=[
+            {'width': 300, 'height': 300, 'crop': 'fill'},
+            {'quality': 'auto'}
+        ]) if cover and cover.image else ''
+        if product.original_price and product.original_price > product.price:
+            product.discount_percentage = round(
+                (product.original_price - product.price) * 100 / product.original_price)
+        batch.append(product)
+        if len(batch) >= 500:
+            Product.objects.bulk_update(
+                batch, ['image_count', 'cover_image_url', 'discount_percentage'])
+            batch = []
+    Product.objects.bulk_update(
+        batch, ['image_count', 'cover_image_url', 'discount_percentage'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0019_remove_orderitem_order_remove_orderitem_product_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='cover_image_url',
+            field=models.URLField(blank=True, default='', max_length=500),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='discount_percentage',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='image_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_cards, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.1.7 on 2026-10-19 12:11
+
+from django.db import migrations, models
+
+
+def seed_changes(apps, schema_editor):
+    # Start the log with every existing object so a sync from 0 is complete.
+    CatalogChange = apps.get_model('api', 'CatalogChange')
+    for kind, model_name in (('product', 'Product'), ('image', 'ProductImage')):
+        model = apps.get_model('api', model_name)
+        batch = []
+        for object_id in model.objects.values_list('id', flat=True).iterator():
+            batch.append(CatalogChange(kind=kind, object_id=object_id, action='upsert'))
+            if len(batch) >= 1000:
+                CatalogChange.objects.bulk_create(batch)
+                batch = []
+        CatalogChange.objects.bulk_create(batch)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_product_card_projection'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CatalogChange',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('product', 'Product'), ('image', 'Product image')], max_length=10)),
+                ('object_id', models.BigIntegerField()),
+                ('action', models.CharField(choices=[('upsert', 'Upsert'), ('delete', 'Delete')], max_length=10)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['kind', 'object_id', 'id'], name='api_catalog_kind_955386_idx')],
+            },
+        ),
+        migrations.RunPython(seed_changes, migrations.RunPython.noop),
+    ]
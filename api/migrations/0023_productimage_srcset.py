@@ -0,0 +1,57 @@
+# Generated by Django 5.1.7 on 2026-10-19 12:20
+
+from django.db import migrations, models
+
+# Frozen copies of settings.IMAGE_VARIANTS and api.variants.build_srcset as
+# they were when this migration was written; refresh_image_srcsets brings
+# the stored values up to date with the current registry.
+IMAGE_VARIANTS = {
+    'square': {'widths': [160, 320, 480, 640], 'crop': 'fill', 'aspect_ratio': '1:1'},
+    'full': {'widths': [480, 768, 1080, 1440, 1920], 'crop': 'limit'},
+}
+
+
+def transformation(spec, width):
+    step = {'width': width, 'crop': spec.get('crop', 'limit')}
+    if spec.get('aspect_ratio'):
+        step['aspect_ratio'] = spec['aspect_ratio']
+    return [step, {'fetch_format': 'auto', 'quality': 'auto'}]
+
+
+def build_srcset(image):
+    return {
+        name: ', '.join(
+            f"{image.build_url(transformation=transformation(spec, width))} {width}w"
+            for width in spec['widths'])
+        for name, spec in IMAGE_VARIANTS.items()
+    }
+
+
+def backfill_srcsets(apps, schema_editor):
+    ProductImage = apps.get_model('api', 'ProductImage')
+    batch = []
+    for image in ProductImage.objects.only('id', 'image').iterator(chunk_size=500):
+        if not image.image:
+            continue
+        image.srcset = build_srcset(image.image)
+        batch.append(image)
+        if len(batch) >= 500:
+            ProductImage.objects.bulk_update(batch, ['srcset'])
+            batch = []
+    ProductImage.objects.bulk_update(batch, ['srcset'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0022_productimage_placeholders'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='productimage',
+            name='srcset',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.RunPython(backfill_srcsets, migrations.RunPython.noop),
+    ]
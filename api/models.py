@@ -1,11 +1,9 @@
 from django.db import models
 from django.contrib.auth.models import User
-from PIL import Image
-from datetime import datetime
-from imagekit.models import ImageSpecField
-from imagekit.processors import ResizeToFill
 from cloudinary.models import CloudinaryField
 
+from .variants import eager_transformations
+
 
 class Product(models.Model):
     CATEGORY_CHOICES = (('Kids', 'Kids'), ('Women', 'Women'), ('Men', 'Men'))
@@ -17,18 +15,56 @@ class Product(models.Model):
     category = models.CharField(choices=CATEGORY_CHOICES, max_length=20)
     stock = models.PositiveIntegerField(default=0)
 
+    # Listing card projection, maintained by api.signals / api.projections
+    cover_image_url = models.URLField(max_length=500, blank=True, default='')
+    image_count = models.PositiveIntegerField(default=0)
+    discount_percentage = models.PositiveSmallIntegerField(default=0)
+
+    # Buffered and flushed by api.counters
+    view_count = models.PositiveIntegerField(default=0)
+    cart_add_count = models.PositiveIntegerField(default=0)
+    popularity = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        # One per ordering/filter of api.filters
+        indexes = [
+            models.Index(fields=['-popularity', '-id'], name='product_popularity_idx'),
+            models.Index(fields=['price', 'id'], name='product_price_idx'),
+            models.Index(fields=['category', 'price', 'id'],
+                         name='product_category_price_idx'),
+            models.Index(fields=['-discount_percentage', '-id'],
+                         name='product_discount_idx'),
+            models.Index(fields=['-discount_percentage', '-id'],
+                         name='product_on_sale_idx',
+                         condition=models.Q(original_price__gt=models.F('price'))),
+        ]
+
     def __str__(self):
         return f'{self.name}'
 
+    def compute_discount_percentage(self):
+        if not self.original_price or self.original_price <= self.price:
+            return 0
+        return round((self.original_price - self.price) * 100 / self.original_price)
+
 
 class ProductImage(models.Model):
     product = models.ForeignKey(
         Product, related_name='images', on_delete=models.CASCADE)
-    image = CloudinaryField('image', help_text="Upload product image")
+    image = CloudinaryField('image', help_text="Upload product image",
+                            eager=eager_transformations, eager_async=True)
     alt_text = models.CharField(
         max_length=200, blank=True, help_text="Alternative text for accessibility")
     created_at = models.DateTimeField(auto_now_add=True, blank=True, null=True)
 
+    # Filled in from the decoded image, see api.placeholders
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    dominant_color = models.CharField(max_length=7, blank=True, default='')
+    placeholder = models.TextField(blank=True, default='')
+    # {variant: srcset}, see api.variants
+    srcset = models.JSONField(blank=True, default=dict)
+
     def __str__(self):
         return f"{self.product.name} - Image {self.id}"
 
@@ -56,6 +92,45 @@ class ProductImage(models.Model):
         ordering = ['-created_at']
 
 
+class CatalogChange(models.Model):
+    """Append-only log behind the catalog delta feed, see api.changes"""
+    PRODUCT = 'product'
+    IMAGE = 'image'
+    KIND_CHOICES = ((PRODUCT, 'Product'), (IMAGE, 'Product image'))
+    UPSERT = 'upsert'
+    DELETE = 'delete'
+    ACTION_CHOICES = ((UPSERT, 'Upsert'), (DELETE, 'Delete'))
+
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(choices=KIND_CHOICES, max_length=10)
+    object_id = models.BigIntegerField()
+    action = models.CharField(choices=ACTION_CHOICES, max_length=10)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['kind', 'object_id', 'id'])]
+
+    def __str__(self):
+        return f'{self.id} {self.action} {self.kind} {self.object_id}'
+
+
+class RelatedProduct(models.Model):
+    """Top products bought together with `product`, see api.recommendations"""
+    product = models.ForeignKey(
+        Product, related_name='related_products', on_delete=models.CASCADE)
+    related = models.ForeignKey(
+        Product, related_name='recommended_with', on_delete=models.CASCADE)
+    score = models.PositiveIntegerField()
+    rank = models.PositiveSmallIntegerField()
+
+    class Meta:
+        constraints = [models.UniqueConstraint(
+            fields=['product', 'rank'], name='unique_related_product_rank')]
+
+    def __str__(self):
+        return f'{self.product_id} -> {self.related_id} ({self.score})'
+
+
 class Cart(models.Model):
     user = models.ForeignKey(
         User, null=True, blank=True, on_delete=models.SET_NULL)
@@ -0,0 +1,127 @@
+"""
+Image dimensions and low-quality placeholders.
+
+Each ProductImage is decoded once with Pillow to store its width, height,
+average colour and a tiny blurred JPEG as a data URI, so clients can
+reserve the right box and paint something before the real image arrives.
+
+Uploads through api.uploads analyze the local file before sending it to
+Cloudinary. Images created any other way (admin inline, shell) are queued
+on a small thread pool once their transaction commits, and fetched with
+settings.IMAGE_PLACEHOLDER_OPENER: a callable taking a ProductImage and
+returning a binary file object. backfill_image_placeholders fills in
+images that predate this or whose analysis failed.
+"""
+import base64
+import io
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.utils.module_loading import import_string
+
+from .cache import bump_catalog_version
+from .changes import record_changes
+from .models import CatalogChange, ProductImage
+
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER_FIELDS = ['width', 'height', 'dominant_color', 'placeholder']
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def open_image_url(image):
+    import requests
+
+    response = requests.get(image.image.build_url(), timeout=10)
+    response.raise_for_status()
+    return io.BytesIO(response.content)
+
+
+def get_opener():
+    return import_string(settings.IMAGE_PLACEHOLDER_OPENER)
+
+
+def analyze_image(file):
+    """Decode `file` once and return the values of PLACEHOLDER_FIELDS"""
+    from PIL import Image, ImageFilter
+
+    size = settings.IMAGE_PLACEHOLDER_SIZE
+    if hasattr(file, 'seek'):
+        file.seek(0)
+    with Image.open(file) as img:
+        width, height = img.size
+        # Lets JPEG decode at a fraction of the full resolution
+        img.draft('RGB', (size * 4, size * 4))
+        small = img.convert('RGB')
+        small.thumbnail((size, size))
+
+    red, green, blue = small.resize((1, 1), Image.Resampling.BOX).getpixel((0, 0))
+    buffer = io.BytesIO()
+    small.filter(ImageFilter.GaussianBlur(1)).save(
+        buffer, 'JPEG', quality=settings.IMAGE_PLACEHOLDER_QUALITY, optimize=True)
+    return {
+        'width': width,
+        'height': height,
+        'dominant_color': f'#{red:02x}{green:02x}{blue:02x}',
+        'placeholder': 'data:image/jpeg;base64,'
+                       + base64.b64encode(buffer.getvalue()).decode(),
+    }
+
+
+def _analyze_stored(image, opener):
+    file = opener(image)
+    try:
+        return analyze_image(file)
+    finally:
+        if hasattr(file, 'close'):
+            file.close()
+
+
+def fill_placeholders(image_ids, opener=None):
+    """Analyze the stored images `image_ids` and save their placeholders"""
+    opener = opener or get_opener()
+    images = ProductImage.objects.filter(pk__in=image_ids).only('id', 'image')
+    done = []
+    for image in images:
+        try:
+            values = _analyze_stored(image, opener)
+        except Exception:
+            logger.exception('Could not analyze product image %s', image.pk)
+            continue
+        ProductImage.objects.filter(pk=image.pk).update(**values)
+        done.append(image.pk)
+    if done:
+        record_changes(CatalogChange.IMAGE, done)
+        bump_catalog_version()
+    return done
+
+
+def _fill_in_background(image_ids):
+    try:
+        return fill_placeholders(image_ids)
+    finally:
+        connections.close_all()
+
+
+def get_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_PLACEHOLDER_WORKERS,
+                thread_name_prefix='placeholders')
+        return _pool
+
+
+def schedule_placeholders(image_ids):
+    """Fill in placeholders in the background once the transaction commits"""
+    if not settings.IMAGE_PLACEHOLDER_ENABLED or not image_ids:
+        return
+    image_ids = list(image_ids)
+    transaction.on_commit(
+        lambda: get_pool().submit(_fill_in_background, image_ids))
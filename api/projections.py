@@ -0,0 +1,37 @@
+"""
+Denormalized listing card columns on Product.
+
+Listing pages read `cover_image_url`, `image_count` and
+`discount_percentage` straight from the product row instead of loading
+every image. The discount is set when a product is saved; the image
+columns are refreshed here whenever images change.
+"""
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+
+from .cache import bump_catalog_version
+from .changes import record_changes
+from .models import CatalogChange, Product, ProductImage
+from .snapshots import schedule_rebuild
+
+
+def cover_url(image_value):
+    if not image_value:
+        return ''
+    return ProductImage(image=image_value).thumbnail_url or ''
+
+
+def refresh_product_cards(product_ids):
+    cover = ProductImage.objects.filter(
+        product=OuterRef('pk')).order_by('-created_at', '-id').values('image')[:1]
+    products = list(Product.objects.filter(pk__in=set(product_ids)).annotate(
+        images_total=Count('images'), cover=Subquery(cover),
+    ).only('pk', 'image_count', 'cover_image_url'))
+    for product in products:
+        product.image_count = product.images_total
+        product.cover_image_url = cover_url(product.cover)
+    Product.objects.bulk_update(
+        products, ['image_count', 'cover_image_url'], batch_size=500)
+    record_changes(CatalogChange.PRODUCT, [product.pk for product in products])
+    bump_catalog_version()
+    transaction.on_commit(schedule_rebuild)
@@ -0,0 +1,151 @@
+"""
+Query auditing for API requests.
+
+Every statement executed while a request is handled is recorded, except
+transaction control (BEGIN, SAVEPOINT, ...).
+Structurally identical statements repeated QUERY_AUDIT_REPEAT_THRESHOLD
+times or more (the usual N+1 pattern) and statements slower than
+QUERY_AUDIT_SLOW_MS are logged together with the view and, when the query
+was triggered while rendering a serializer, the serializer field.
+
+Views declare their budget next to the code:
+
+    class ProductView(APIView):
+        query_budget = 2                      # any method
+        query_budget = {'get': 2, 'post': 5}  # per method
+"""
+import logging
+import re
+import sys
+import time
+from collections import namedtuple
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+logger = logging.getLogger(__name__)
+
+AuditedQuery = namedtuple('AuditedQuery', ['sql', 'duration_ms', 'field'])
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_WHITESPACE = re.compile(r'\s+')
+# Not queries: backends differ in how many they issue for the same work
+_TRANSACTION_CONTROL = re.compile(
+    r'\s*(?:BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE|START TRANSACTION)\b', re.IGNORECASE)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def normalize_sql(sql):
+    """Reduce a statement to its shape so N+1 repeats compare equal"""
+    sql = sql.replace('%s', '?')
+    sql = _STRING_LITERAL.sub('?', sql)
+    sql = _NUMBER_LITERAL.sub('?', sql)
+    sql = _PLACEHOLDER_LIST.sub('(?)', sql)
+    return _WHITESPACE.sub(' ', sql).strip()
+
+
+def _serializer_field():
+    """Name the serializer field being rendered when a query fires, if any"""
+    frame = sys._getframe(2)
+    while frame is not None:
+        if frame.f_code.co_name == 'to_representation':
+            field = frame.f_locals.get('field')
+            owner = frame.f_locals.get('self')
+            if getattr(field, 'field_name', None):
+                return f'{type(owner).__name__}.{field.field_name}'
+        frame = frame.f_back
+    return None
+
+
+def budget_for(view_class, method):
+    budget = getattr(view_class, 'query_budget', None)
+    if isinstance(budget, dict):
+        return budget.get(method.lower())
+    return budget
+
+
+def allow_queries(request, count):
+    """Raise the budget of `request` for one-off work such as a cart merge"""
+    audit = getattr(getattr(request, '_request', request), 'query_audit', None)
+    if audit is not None and audit.budget is not None:
+        audit.budget += count
+
+
+class QueryAudit:
+    """Context manager recording the queries run on every database alias"""
+
+    def __init__(self, label=None, budget=None):
+        self.label = label
+        self.budget = budget
+        self.queries = []
+        self._stack = None
+
+    def __enter__(self):
+        self._stack = ExitStack()
+        for alias in connections:
+            self._stack.enter_context(
+                connections[alias].execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self._stack.close()
+        return False
+
+    def __call__(self, execute, sql, params, many, context):
+        if _TRANSACTION_CONTROL.match(sql):
+            return execute(sql, params, many, context)
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration_ms = (time.perf_counter() - start) * 1000
+            self.queries.append(
+                AuditedQuery(sql, duration_ms, _serializer_field()))
+
+    @property
+    def count(self):
+        return len(self.queries)
+
+    def repeated(self, threshold=None):
+        """Return (sql, count, fields) for statements repeated too often"""
+        if threshold is None:
+            threshold = settings.QUERY_AUDIT_REPEAT_THRESHOLD
+        groups = {}
+        for query in self.queries:
+            groups.setdefault(normalize_sql(query.sql), []).append(query)
+        return [
+            (shape, len(queries),
+             sorted({q.field for q in queries if q.field}))
+            for shape, queries in groups.items()
+            if len(queries) >= threshold
+        ]
+
+    def slow(self, threshold_ms=None):
+        if threshold_ms is None:
+            threshold_ms = settings.QUERY_AUDIT_SLOW_MS
+        return [q for q in self.queries if q.duration_ms >= threshold_ms]
+
+    def report(self):
+        label = self.label or 'unknown view'
+        for shape, count, fields in self.repeated():
+            logger.warning(
+                'Possible N+1 in %s: %d identical queries%s: %s',
+                label, count,
+                f" from {', '.join(fields)}" if fields else '', shape)
+        for query in self.slow():
+            logger.warning(
+                'Slow query in %s (%.1f ms)%s: %s',
+                label, query.duration_ms,
+                f' from {query.field}' if query.field else '', query.sql)
+        if self.budget is not None and self.count > self.budget:
+            message = (f'{label} ran {self.count} queries, '
+                       f'budget is {self.budget}')
+            logger.warning(message)
+            if settings.QUERY_AUDIT_RAISE:
+                raise QueryBudgetExceeded(message)
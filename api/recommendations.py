@@ -0,0 +1,128 @@
+"""
+"Frequently bought together" recommendations.
+
+build_related_products() streams every CartItem ordered by cart, counts
+how often each pair of products shares a cart and stores the top K
+partners of each product in RelatedProduct, which
+`GET /api/product/<id>/related/` reads with one indexed query.
+
+Memory stays bounded however many cart items there are: items are read
+in chunks with .iterator(), a pair is packed into a single 64-bit key,
+and counts live in two sorted arrays (keys and counts, 12 bytes a pair)
+that each batch of MERGE_BATCH pair occurrences is merged into. Whenever
+more than RELATED_PRODUCTS_MAX_PAIRS pairs are tracked the rarest ones are
+dropped (lossy counting). Pairs seen only a handful of times are the
+ones lost, and they would not have made anyone's top K anyway.
+"""
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import defaultdict
+from itertools import combinations, groupby
+from operator import itemgetter
+
+from django.conf import settings
+from django.db import transaction
+
+from .cache import bump_catalog_version
+from .models import CartItem, RelatedProduct
+
+PAIR_SHIFT = 32
+# Pair occurrences sorted at once; bounds the temporary list sorted() builds
+MERGE_BATCH = 1 << 18
+
+
+def _merge(keys, counts, batch):
+    """Add the unsorted pair keys of `batch` to the sorted `keys`/`counts`"""
+    merged_keys, merged_counts = array('Q'), array('I')
+    index, size = 0, len(keys)
+    for key, group in groupby(sorted(batch)):
+        count = sum(1 for _ in group)
+        position = bisect_left(keys, key, index)
+        merged_keys.extend(keys[index:position])
+        merged_counts.extend(counts[index:position])
+        index = position
+        if index < size and keys[index] == key:
+            count += counts[index]
+            index += 1
+        merged_keys.append(key)
+        merged_counts.append(count)
+    merged_keys.extend(keys[index:])
+    merged_counts.extend(counts[index:])
+    return merged_keys, merged_counts
+
+
+def _prune(keys, counts, floor):
+    """Drop the pairs counted `floor` times or less, return the new floor too"""
+    while True:
+        keys = array('Q', (key for key, count in zip(keys, counts) if count > floor))
+        counts = array('I', (count for count in counts if count > floor))
+        floor += 1
+        if len(keys) * 2 <= settings.RELATED_PRODUCTS_MAX_PAIRS:
+            return keys, counts, floor
+
+
+def count_pairs(max_cart_size, chunk_size):
+    """
+    Sorted arrays (keys, counts): keys[i] is `a << PAIR_SHIFT | b` for
+    a < b, and counts[i] the carts holding both a and b
+    """
+    keys, counts, batch = array('Q'), array('I'), array('Q')
+    floor = 0
+    items = CartItem.objects.order_by('cart_id').values_list(
+        'cart_id', 'product_id').iterator(chunk_size=chunk_size)
+    for _, rows in groupby(items, key=itemgetter(0)):
+        products = sorted({product_id for _, product_id in rows})
+        if len(products) < 2 or len(products) > max_cart_size:
+            continue
+        batch.extend(a << PAIR_SHIFT | b for a, b in combinations(products, 2))
+        if len(batch) >= MERGE_BATCH:
+            keys, counts = _merge(keys, counts, batch)
+            batch = array('Q')
+            if len(keys) > settings.RELATED_PRODUCTS_MAX_PAIRS:
+                keys, counts, floor = _prune(keys, counts, floor)
+    if batch:
+        keys, counts = _merge(keys, counts, batch)
+    return keys, counts
+
+
+def top_related(keys, counts, top_k, min_count):
+    """{product id: [(score, related id), ...] best first}"""
+    best = defaultdict(list)
+    mask = (1 << PAIR_SHIFT) - 1
+    for key, count in zip(keys, counts):
+        if count < min_count:
+            continue
+        a, b = key >> PAIR_SHIFT, key & mask
+        for product_id, related_id in ((a, b), (b, a)):
+            heap = best[product_id]
+            # Ties prefer the lower id, so runs give stable results
+            entry = (count, -related_id)
+            if len(heap) < top_k:
+                heapq.heappush(heap, entry)
+            elif entry > heap[0]:
+                heapq.heapreplace(heap, entry)
+    return {
+        product_id: [(count, -negated) for count, negated in sorted(heap, reverse=True)]
+        for product_id, heap in best.items()
+    }
+
+
+def build_related_products(top_k=None, min_count=None, max_cart_size=None,
+                           chunk_size=5000):
+    top_k = top_k or settings.RELATED_PRODUCTS_TOP_K
+    min_count = min_count or settings.RELATED_PRODUCTS_MIN_COUNT
+    max_cart_size = max_cart_size or settings.RELATED_PRODUCTS_MAX_CART_SIZE
+
+    related = top_related(*count_pairs(max_cart_size, chunk_size), top_k, min_count)
+    rows = (
+        RelatedProduct(product_id=product_id, related_id=related_id,
+                       score=score, rank=rank)
+        for product_id, partners in related.items()
+        for rank, (score, related_id) in enumerate(partners)
+    )
+    with transaction.atomic():
+        RelatedProduct.objects.all().delete()
+        created = len(RelatedProduct.objects.bulk_create(rows, batch_size=1000))
+    bump_catalog_version()
+    return len(related), created
@@ -2,15 +2,93 @@ from rest_framework import serializers
 from .models import Product, Cart, CartItem,  ProductImage, CustomerMessage
 
 
+def query_param_list(request, name):
+    value = request.query_params.get(name) if request is not None else None
+    if not value:
+        return []
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
 class ProductImageSerializer(serializers.ModelSerializer):
     image_url = serializers.ReadOnlyField(source='image.url')
     thumbnail_url = serializers.ReadOnlyField()
     medium_url = serializers.ReadOnlyField()
 
+    # ?image_variants= names -> serializer fields and the columns they read
+    VARIANTS = {
+        'original': (['image', 'image_url'], ['image']),
+        'thumbnail': (['thumbnail_url'], ['image']),
+        'medium': (['medium_url'], ['image']),
+        'placeholder': (['dominant_color', 'placeholder'],
+                        ['dominant_color', 'placeholder']),
+        'srcset': (['srcset'], ['srcset']),
+    }
+    ALWAYS = ['id', 'alt_text', 'width', 'height']
+
     class Meta:
         model = ProductImage
-        fields = ['id', 'image', 'image_url',
-                  'thumbnail_url', 'medium_url', 'alt_text']
+        fields = ['id', 'image', 'image_url', 'thumbnail_url', 'medium_url',
+                  'srcset', 'alt_text', 'width', 'height', 'dominant_color',
+                  'placeholder']
+
+    @classmethod
+    def known_variants(cls, variants):
+        return [variant for variant in variants if variant in cls.VARIANTS]
+
+    @classmethod
+    def columns_for(cls, variants):
+        variants = cls.known_variants(variants) or list(cls.VARIANTS)
+        columns = {'product_id', *cls.ALWAYS}
+        for variant in variants:
+            columns.update(cls.VARIANTS[variant][1])
+        return sorted(columns)
+
+    def select_variants(self, variants):
+        variants = self.known_variants(variants)
+        if not variants:
+            return
+        keep = set(self.ALWAYS)
+        for variant in variants:
+            keep.update(self.VARIANTS[variant][0])
+        for name in set(self.fields) - keep:
+            self.fields.pop(name)
+
+
+class DynamicFieldsMixin:
+    """
+    Drop the fields a client did not ask for with `?fields=a,b` (the id is
+    always kept) and narrow nested images to `?image_variants=thumbnail,...`
+    before anything is serialized. Views use requested_fields() and
+    image_columns() to load only the columns those fields read.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        requested = query_param_list(request, 'fields')
+        if requested:
+            for name in set(self.fields) - set(requested) - {'id'}:
+                self.fields.pop(name)
+        images = self.fields.get('images')
+        variants = query_param_list(request, 'image_variants')
+        if images is not None and variants:
+            images.child.select_variants(variants)
+
+    @classmethod
+    def requested_fields(cls, request):
+        requested = query_param_list(request, 'fields')
+        return [name for name in cls.Meta.fields
+                if not requested or name in requested or name == 'id']
+
+    @classmethod
+    def image_columns(cls, request):
+        return ProductImageSerializer.columns_for(
+            query_param_list(request, 'image_variants'))
+
+
+class ProductImageChangeSerializer(ProductImageSerializer):
+    class Meta(ProductImageSerializer.Meta):
+        fields = ProductImageSerializer.Meta.fields + ['product']
 
 
 class ProductSerializer(serializers.ModelSerializer):
@@ -22,7 +100,14 @@ class ProductSerializer(serializers.ModelSerializer):
                   "price", "category", "images"]
 
 
-class SingleProductSerializer(serializers.ModelSerializer):
+class ProductCardSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Product
+        fields = ["id", "name", "original_price", "price", "category", "stock",
+                  "cover_image_url", "image_count", "discount_percentage"]
+
+
+class SingleProductSerializer(DynamicFieldsMixin, serializers.ModelSerializer):
     images = ProductImageSerializer(many=True, read_only=True)
 
     class Meta:
@@ -1,9 +1,17 @@
+import cloudinary.api
+import cloudinary.uploader
+from django.core.files.uploadedfile import UploadedFile
 from django.dispatch import receiver
-from django.db.models.signals import post_delete, pre_delete
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_delete, pre_save
 from django.dispatch import receiver
-from .models import ProductImage
-import cloudinary.uploader
-import cloudinary.api
+from .models import CatalogChange, Product, ProductImage
+from .cache import bump_catalog_version
+from .changes import record_changes
+from .projections import refresh_product_cards
+from .placeholders import schedule_placeholders
+from .snapshots import schedule_rebuild
+from .variants import build_srcset
 
 
 @receiver(pre_delete, sender=ProductImage)
@@ -24,3 +32,54 @@ def delete_image_and_thumbnails(sender, instance, **kwargs):
                     f"Deleted image and thumbnails from Cloudinary: {public_id}")
         except Exception as e:
             print(f"Error deleting image from Cloudinary: {e}")
+
+
+@receiver(pre_save, sender=Product)
+def set_discount_percentage(sender, instance, **kwargs):
+    instance.discount_percentage = instance.compute_discount_percentage()
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def invalidate_catalog_cache(sender, instance, **kwargs):
+    bump_catalog_version()
+    transaction.on_commit(schedule_rebuild)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def log_catalog_change(sender, instance, signal, **kwargs):
+    kind = CatalogChange.PRODUCT if sender is Product else CatalogChange.IMAGE
+    action = CatalogChange.DELETE if signal is post_delete else CatalogChange.UPSERT
+    record_changes(kind, [instance.pk], action)
+
+
+@receiver(post_save, sender=ProductImage)
+@receiver(post_delete, sender=ProductImage)
+def refresh_product_card(sender, instance, **kwargs):
+    refresh_product_cards([instance.product_id])
+
+
+@receiver(pre_save, sender=ProductImage)
+def reset_derived_image_fields(sender, instance, **kwargs):
+    if isinstance(instance.image, UploadedFile):
+        # A new file replaces the image, recompute everything derived from it
+        instance.srcset = {}
+        instance.width = instance.height = None
+        instance.dominant_color = instance.placeholder = ''
+
+
+@receiver(post_save, sender=ProductImage)
+def store_image_srcset(sender, instance, **kwargs):
+    if instance.image and not instance.srcset:
+        image = sender._meta.get_field('image').to_python(instance.image)
+        instance.srcset = build_srcset(image)
+        sender.objects.filter(pk=instance.pk).update(srcset=instance.srcset)
+
+
+@receiver(post_save, sender=ProductImage)
+def queue_image_placeholder(sender, instance, **kwargs):
+    if instance.image and not instance.placeholder:
+        schedule_placeholders([instance.pk])
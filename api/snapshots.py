@@ -0,0 +1,143 @@
+"""
+Static catalog snapshots.
+
+The card data of the whole catalog, and of each category, is rendered to
+JSON files named after a hash of their content, with a gzipped copy next
+to them. api.middleware.StaticFilesMiddleware serves them from
+CATALOG_SNAPSHOT_ROOT under CATALOG_SNAPSHOT_URL with immutable cache
+headers, so clients and CDNs never hit Django for catalog data;
+`GET /api/catalog/snapshot/` tells clients the current file names.
+
+Catalog writes schedule a rebuild CATALOG_SNAPSHOT_DEBOUNCE seconds later,
+coalescing bursts of edits into one build. Until a first snapshot exists
+the manifest endpoint answers 503 and starts a build in the background;
+requests never build one themselves. Each process writes to its own disk,
+so on hosts with ephemeral per-instance storage run build_catalog_snapshot
+at release time as well.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.utils import timezone
+
+from .models import Product
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = 'current.json'
+
+_timer = None
+_timer_lock = threading.Lock()
+
+
+def _write_atomic(path, content):
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix='.tmp-')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(content)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def _write_snapshot(root, name, items):
+    body = json.dumps(items, cls=DjangoJSONEncoder, separators=(',', ':')).encode()
+    digest = hashlib.sha256(body).hexdigest()[:16]
+    filename = f'catalog-{name}.{digest}.json'
+    path = root / filename
+    if path.exists():
+        os.utime(path)  # Keep it the newest generation for _prune
+    else:
+        _write_atomic(Path(f'{path}.gz'), gzip.compress(body, mtime=0))
+        _write_atomic(path, body)
+    return filename
+
+
+def _prune(root, keep):
+    """Drop snapshot files no longer in the newest `keep` generations"""
+    generations = {}
+    for path in root.glob('catalog-*.json'):
+        generations.setdefault(path.name.split('.')[0], []).append(path)
+    for paths in generations.values():
+        paths.sort(key=lambda path: path.stat().st_mtime, reverse=True)
+        for path in paths[keep:]:
+            for stale in (path, Path(f'{path}.gz')):
+                stale.unlink(missing_ok=True)
+
+
+def build_snapshot():
+    # DRF is only needed here; api.signals imports this module at startup
+    from .serializers import ProductCardSerializer
+
+    root = Path(settings.CATALOG_SNAPSHOT_ROOT)
+    root.mkdir(parents=True, exist_ok=True)
+    products = Product.objects.only(*ProductCardSerializer.Meta.fields).order_by('id')
+    items = list(ProductCardSerializer(products, many=True).data)
+
+    url = settings.CATALOG_SNAPSHOT_URL
+    manifest = {
+        'built_at': timezone.now().isoformat(),
+        'count': len(items),
+        'all': url + _write_snapshot(root, 'all', items),
+        'categories': {},
+    }
+    for category, _ in Product.CATEGORY_CHOICES:
+        sliced = [item for item in items if item['category'] == category]
+        manifest['categories'][category] = url + _write_snapshot(
+            root, category.lower(), sliced)
+
+    _write_atomic(root / MANIFEST_NAME, json.dumps(manifest).encode())
+    _prune(root, settings.CATALOG_SNAPSHOT_KEEP)
+    return manifest
+
+
+def current_snapshot():
+    """The manifest of the latest snapshot, None until one is built"""
+    try:
+        with open(Path(settings.CATALOG_SNAPSHOT_ROOT) / MANIFEST_NAME) as fh:
+            return json.load(fh)
+    except (OSError, ValueError):
+        return None
+
+
+def _rebuild():
+    try:
+        build_snapshot()
+    except Exception:
+        logger.exception('Catalog snapshot rebuild failed')
+    finally:
+        connections.close_all()
+
+
+def schedule_rebuild():
+    global _timer
+    if not settings.CATALOG_SNAPSHOT_ENABLED:
+        return
+    with _timer_lock:
+        if _timer is not None:
+            _timer.cancel()
+        _timer = threading.Timer(settings.CATALOG_SNAPSHOT_DEBOUNCE, _rebuild)
+        _timer.daemon = True
+        _timer.start()
+
+
+def request_build():
+    """Build a missing snapshot now, in the background, unless one is pending"""
+    global _timer
+    if not settings.CATALOG_SNAPSHOT_ENABLED:
+        return
+    with _timer_lock:
+        if _timer is None or not _timer.is_alive():
+            _timer = threading.Timer(0, _rebuild)
+            _timer.daemon = True
+            _timer.start()
@@ -1,3 +1,762 @@
-from django.test import TestCase
+import io
+import random
+import tempfile
+import threading
+from collections import Counter
+from itertools import combinations
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from cloudinary import exceptions as cloudinary_errors
+from django.conf import settings
+from django.conf.urls.static import static
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.test import Client, RequestFactory, TestCase, TransactionTestCase, override_settings
+from PIL import Image
+
+from . import cache as catalog_cache
+from . import counters, fake_cloudinary, filters, placeholders, recommendations, snapshots, views
+from .middleware import QueryAuditMiddleware
+from .models import Cart, CartItem, CatalogChange, Product, ProductImage, RelatedProduct
+from .query_audit import QueryAudit, QueryBudgetExceeded
+from .serializers import CartItemSerializer, ProductCardSerializer, ProductImageSerializer
+from .uploads import upload_product_images
+
+
+def make_product(**kwargs):
+    values = {'name': 'Shirt', 'price': 10, 'category': 'Women'}
+    values.update(kwargs)
+    return Product.objects.create(**values)
+
+
+def image_file(name='image.jpg', size=(64, 48), color=(200, 30, 30)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), content_type='image/jpeg')
+
+
+class FakeCloudinaryTests(TestCase):
+    def setUp(self):
+        fake_cloudinary.clear()
+
+    def test_image_round_trip(self):
+        image = ProductImage.objects.create(product=make_product(), image=image_file())
+        public_id = image.image.public_id
+        self.assertIn(public_id, fake_cloudinary._files)
+
+        with Image.open(fake_cloudinary.open_image(image)) as stored:
+            self.assertEqual(stored.size, (64, 48))
+
+        image.delete()
+        self.assertNotIn(public_id, fake_cloudinary._files)
+
+    def test_no_placeholder_threads(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            ProductImage.objects.create(product=make_product(), image=image_file())
+        self.assertIsNone(placeholders._pool)
+
+
+class LocalProfileTests(TestCase):
+    def test_debug_media_route_stays_in_media_root(self):
+        with self.settings(DEBUG=True):
+            pattern, = static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+        self.assertEqual(str(pattern.pattern), '^media/(?P<path>.*)$')
+        self.assertEqual(pattern.default_args['document_root'], settings.BASE_DIR / 'media')
+
+
+class QueryBudgetTests(TestCase):
+    """Requests run under QUERY_AUDIT_RAISE, so a blown query_budget fails"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [make_product(name=f'Product {n}', price=10 + n) for n in range(3)]
+        for product in cls.products:
+            for _ in range(2):
+                ProductImage.objects.create(product=product, image=image_file())
+
+    def setUp(self):
+        cache.clear()
+        self.client.defaults['HTTP_X_TEMPORARY_USER'] = 'guest'
+
+    def test_product_list(self):
+        response = self.client.get('/api/products/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()), 3)
+
+    def test_product_detail(self):
+        response = self.client.get(f'/api/product/{self.products[0].id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['images']), 2)
+
+    def test_cart(self):
+        for product in self.products:
+            response = self.client.post(
+                '/api/cart/', {'productId': product.id, 'quantity': 1},
+                content_type='application/json')
+            self.assertEqual(response.status_code, 201)
+        response = self.client.put(
+            '/api/cart/', {'productId': self.products[0].id, 'quantity': 3},
+            content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get('/api/cart/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([item['quantity'] for item in response.json()], [3, 1, 1])
+
+        response = self.client.delete(f'/api/cart/?productId={self.products[1].id}')
+        self.assertEqual(response.status_code, 200)
+
+    def test_cart_item(self):
+        self.client.post('/api/cart/', {'productId': self.products[0].id, 'quantity': 2},
+                         content_type='application/json')
+        response = self.client.get(f'/api/cart/{self.products[0].id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['quantity'], 2)
+
+    def test_budget_overrun_fails(self):
+        with mock.patch.object(views.ProductView, 'query_budget', 0):
+            with self.assertRaises(QueryBudgetExceeded):
+                self.client.get('/api/products/')
+
+
+class QueryAuditTests(TestCase):
+    def test_reports_nested_serializer_n_plus_one(self):
+        cart = Cart.objects.create(temporary_user='guest')
+        for n in range(3):
+            cart.cartitem_set.create(product=make_product(name=f'Product {n}'), quantity=1)
+
+        # Its savepoints are not counted
+        with QueryAudit(label='cart') as audit, transaction.atomic():
+            # No select_related/prefetch_related: one product and one images
+            # query per line
+            CartItemSerializer(CartItem.objects.filter(cart=cart), many=True).data
+        repeated = {shape: (count, fields) for shape, count, fields in audit.repeated(3)}
+
+        self.assertEqual(audit.count, 7)
+        product_shape = next(shape for shape in repeated if 'FROM "api_product"' in shape)
+        self.assertIn('WHERE "api_product"."id" = ? LIMIT ?', product_shape)
+        self.assertEqual(repeated[product_shape], (3, ['CartItemSerializer.product']))
+        images_shape = next(shape for shape in repeated if 'FROM "api_productimage"' in shape)
+        self.assertEqual(repeated[images_shape], (3, ['ProductSerializer.images']))
+        self.assertEqual(len(audit.slow(threshold_ms=0)), 7)
+        with self.assertLogs('api.query_audit', 'WARNING') as logs:
+            audit.report()
+        self.assertIn('Possible N+1 in cart: 3 identical queries from '
+                      'CartItemSerializer.product', logs.output[0])
+
+
+class AsyncQueryAuditTests(TestCase):
+    async def test_audits_async_requests_natively(self):
+        async def view(request):
+            await Product.objects.acount()
+
+        middleware = QueryAuditMiddleware(view)
+        self.assertTrue(iscoroutinefunction(middleware))
+        request = RequestFactory().get('/api/async/products/')
+        await middleware(request)
+        self.assertEqual(request.query_audit.count, 1)
+
+
+class ProductFilterTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        make_product(name='Full price', price=30, original_price=30, category='Men')
+        make_product(name='Half price', price=10, original_price=20, category='Women')
+        make_product(name='Small discount', price=18, original_price=20, category='Women')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_plans_use_an_index(self):
+        for params in filters.PLAN_CASES:
+            with self.subTest(**params):
+                plan = filters.filter_products(
+                    Product.objects.only(*ProductCardSerializer.Meta.fields), params).explain()
+                self.assertTrue(filters.uses_index(plan, params, connection.vendor), plan)
+
+    async def test_async_list_matches_drf_view(self):
+        for query in ['', 'ordering=-price', 'on_sale=true&ordering=discount',
+                      'category=Women&ordering=price', 'ordering=cheapest']:
+            with self.subTest(query=query):
+                expected = await sync_to_async(self.client.get)(f'/api/products/?{query}')
+                response = await self.async_client.get(f'/api/async/products/?{query}')
+                self.assertEqual(response.status_code, expected.status_code)
+                self.assertEqual(response.json(), expected.json())
+
+
+class FlakyUploader:
+    """Fake uploader failing each file's first `failures` attempts with `error`"""
+
+    def __init__(self, failures=0, error=ConnectionError, barrier=None):
+        self.failures = failures
+        self.error = error
+        self.barrier = barrier
+        self.attempts = {}
+        self.running = self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, file):
+        with self.lock:
+            attempt = self.attempts[file.name] = self.attempts.get(file.name, 0) + 1
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        try:
+            if self.barrier is not None:
+                self.barrier.wait()
+            if attempt <= self.failures:
+                raise self.error('upload failed')
+            return fake_cloudinary.upload(file)
+        finally:
+            with self.lock:
+                self.running -= 1
+
+
+@mock.patch('api.uploads.time.sleep')
+class UploadProductImagesTests(TestCase):
+    def setUp(self):
+        self.product = make_product()
+
+    def test_uploads_concurrently_and_bulk_creates(self, sleep):
+        uploader = FlakyUploader(barrier=threading.Barrier(3, timeout=5))
+        files = [image_file(f'{n}.jpg', size=(40 + n, 30)) for n in range(6)]
+        images, failures = upload_product_images(
+            self.product, files, alt_text='Front', uploader=uploader, max_workers=3)
+
+        self.assertEqual(failures, [])
+        self.assertEqual(uploader.peak, 3)
+        self.assertEqual(len(images), 6)
+        self.assertTrue(all(image.pk for image in images))
+        self.assertEqual([image.width for image in images], [40, 41, 42, 43, 44, 45])
+        self.assertTrue(all(image.placeholder and image.srcset for image in images))
+        self.assertEqual(self.product.images.filter(alt_text='Front').count(), 6)
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.image_count, 6)
+        sleep.assert_not_called()
+
+    def test_retries_transient_errors_with_backoff(self, sleep):
+        uploader = FlakyUploader(failures=2, error=cloudinary_errors.GeneralError)
+        images, failures = upload_product_images(
+            self.product, [image_file()], uploader=uploader, retries=2, backoff=0.5)
+
+        self.assertEqual((len(images), failures), (1, []))
+        self.assertEqual(uploader.attempts, {'image.jpg': 3})
+        self.assertEqual([call.args[0] for call in sleep.call_args_list], [0.5, 1.0])
+
+    def test_reports_failure_after_all_retries(self, sleep):
+        uploader = FlakyUploader(failures=3)
+        files = [image_file('a.jpg'), image_file('b.jpg')]
+        images, failures = upload_product_images(
+            self.product, files, uploader=uploader, retries=2, backoff=0.5)
+
+        self.assertEqual(images, [])
+        self.assertEqual([name for name, _ in failures], ['a.jpg', 'b.jpg'])
+        self.assertIsInstance(failures[0][1], ConnectionError)
+        self.assertEqual(uploader.attempts, {'a.jpg': 3, 'b.jpg': 3})
+        self.assertFalse(self.product.images.exists())
+
+    def test_does_not_retry_permanent_errors(self, sleep):
+        uploader = FlakyUploader(failures=1, error=cloudinary_errors.BadRequest)
+        images, failures = upload_product_images(
+            self.product, [image_file()], uploader=uploader, retries=2, backoff=0.5)
+
+        self.assertEqual(images, [])
+        self.assertIsInstance(failures[0][1], cloudinary_errors.BadRequest)
+        self.assertEqual(uploader.attempts, {'image.jpg': 1})
+        sleep.assert_not_called()
+
+
+@override_settings(DATABASE_ROUTERS=['backend.routers.ReplicaRouter'])
+class ReplicaRoutingTests(TestCase):
+    """`default` and `replica_0` hold different products to tell them apart"""
+    databases = {'default', 'replica_0'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = Product.objects.create(name='Primary', price=10, category='Women')
+        Product.objects.using('replica_0').bulk_create([
+            Product(name='Replica', price=10, category='Women')])
+
+    def setUp(self):
+        cache.clear()
+
+    def product_names(self, client):
+        response = self.client.get('/api/products/', HTTP_X_TEMPORARY_USER=client)
+        self.assertEqual(response.status_code, 200)
+        return [product['name'] for product in response.json()]
+
+    def add_to_cart(self, client):
+        response = self.client.post(
+            '/api/cart/', {'productId': self.product.id},
+            content_type='application/json', HTTP_X_TEMPORARY_USER=client)
+        self.assertEqual(response.status_code, 201)
+
+    def test_safe_requests_read_from_replica(self):
+        self.assertEqual(self.product_names('alice'), ['Replica'])
+
+    def test_writer_is_pinned_to_primary(self):
+        self.add_to_cart('alice')
+        self.assertEqual(self.product_names('alice'), ['Primary'])
+        self.assertEqual(self.product_names('bob'), ['Replica'])
+
+    @override_settings(REPLICA_PIN_SECONDS=0)
+    def test_pin_expires(self):
+        self.add_to_cart('alice')
+        self.assertEqual(self.product_names('alice'), ['Replica'])
+
+
+class SparseFieldsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.product = make_product(description='Cotton')
+        ProductImage.objects.create(product=cls.product, image=image_file(), alt_text='Front')
+
+    def setUp(self):
+        cache.clear()
+
+    def get(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), [query['sql'] for query in queries]
+
+    def test_list_fields(self):
+        data, queries = self.get('/api/products/?fields=name,price,unknown')
+        self.assertEqual(set(data[0]), {'id', 'name', 'price'})
+        self.assertEqual(len(queries), 1)
+        self.assertIn('"api_product"."name"', queries[0])
+        self.assertNotIn('cover_image_url', queries[0])
+        self.assertNotIn('"api_product"."stock"', queries[0])
+
+    def test_detail_fields_without_images(self):
+        data, queries = self.get(f'/api/product/{self.product.id}/?fields=name')
+        self.assertEqual(data, {'id': self.product.id, 'name': 'Shirt'})
+        self.assertEqual(len(queries), 1)
+        self.assertNotIn('"api_product"."description"', queries[0])
+
+    def test_image_variants(self):
+        data, queries = self.get(
+            f'/api/product/{self.product.id}/?image_variants=thumbnail,unknown')
+        self.assertEqual(set(data['images'][0]),
+                         {'id', 'alt_text', 'width', 'height', 'thumbnail_url'})
+        self.assertEqual(data['description'], 'Cotton')
+        columns = next(sql for sql in queries if 'FROM "api_productimage"' in sql).split(' FROM ')[0]
+        self.assertIn('"api_productimage"."image"', columns)
+        for column in ['srcset', 'placeholder', 'dominant_color', 'created_at']:
+            self.assertNotIn(f'"api_productimage"."{column}"', columns)
+
+    def test_unknown_variants_are_ignored(self):
+        data, _ = self.get(f'/api/product/{self.product.id}/?image_variants=unknown')
+        self.assertEqual(set(data['images'][0]), set(ProductImageSerializer.Meta.fields))
+
+    def test_sparse_responses_are_not_cached(self):
+        self.get(f'/api/product/{self.product.id}/?fields=name')
+        data, _ = self.get(f'/api/product/{self.product.id}/')
+        self.assertEqual(data['description'], 'Cotton')
+        self.assertEqual(len(data['images']), 1)
+
+
+class ProductBatchTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [make_product(name=f'Product {n}') for n in range(3)]
+
+    def setUp(self):
+        cache.clear()
+
+    def batch(self, ids):
+        return self.client.get(f'/api/products/batch/?ids={ids}')
+
+    def test_keeps_request_order_and_reports_missing(self):
+        first, second, third = self.products
+        missing = third.id + 100
+        response = self.batch(f'{third.id},{first.id},{missing},{third.id},{second.id}')
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([product['id'] for product in data['products']],
+                         [third.id, first.id, second.id])
+        self.assertEqual(data['missing'], [missing])
+
+    def test_reuses_the_product_cache(self):
+        ids = ','.join(str(product.id) for product in self.products)
+        self.client.get(f'/api/product/{self.products[0].id}/')
+        with CaptureQueriesContext(connection) as queries:
+            first = self.batch(ids).json()
+        # Only the two products not cached by the detail view are loaded
+        self.assertIn(f'IN ({self.products[1].id}, {self.products[2].id})', queries[0]['sql'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.batch(ids).json(), first)
+
+    @override_settings(PRODUCT_BATCH_MAX=2)
+    def test_rejects_bad_requests(self):
+        for ids in ['1,2,3', '1,x', '']:
+            with self.subTest(ids=ids):
+                self.assertEqual(self.batch(ids).status_code, 400)
+
+
+@override_settings(POPULARITY_COUNTERS_ENABLED=True, POPULARITY_CART_WEIGHT=10)
+@mock.patch('api.counters._ensure_flusher')
+class PopularityCounterTests(TestCase):
+    def setUp(self):
+        counters._take_pending()
+        self.quiet, self.viewed, self.added = [
+            make_product(name=name) for name in ['Quiet', 'Viewed', 'Added']]
+
+    def record(self):
+        for _ in range(5):
+            counters.record_view(self.viewed.id)
+        counters.record_view(self.added.id)
+        counters.record_cart_add(self.added.id)
+
+    def counts(self):
+        return {name: (views, adds, popularity) for name, views, adds, popularity in
+                Product.objects.values_list('name', 'view_count', 'cart_add_count', 'popularity')}
+
+    def test_flush_writes_buffered_counts(self, ensure_flusher):
+        self.record()
+        self.assertEqual(self.counts()['Viewed'], (0, 0, 0))
+        with mock.patch.object(counters, 'FLUSH_BATCH_SIZE', 1), \
+                self.assertNumQueries(2):
+            self.assertEqual(counters.flush(), 2)
+        ensure_flusher.assert_called()
+
+        self.record()
+        counters.flush()
+        self.assertEqual(self.counts(), {
+            'Quiet': (0, 0, 0), 'Viewed': (10, 0, 10), 'Added': (2, 2, 22)})
+        self.assertEqual(counters.flush(), 0)
+        response = self.client.get('/api/products/?sort=popular')
+        self.assertEqual([product['name'] for product in response.json()],
+                         ['Added', 'Viewed', 'Quiet'])
+
+    def test_views_record_counts(self, ensure_flusher):
+        self.client.get(f'/api/product/{self.viewed.id}/')
+        self.client.post('/api/cart/', {'productId': self.added.id, 'quantity': 1},
+                         content_type='application/json', headers={'X-Temporary-User': 'guest'})
+        counters.flush()
+        self.assertEqual(self.counts()['Viewed'], (1, 0, 1))
+        self.assertEqual(self.counts()['Added'], (0, 1, 10))
+
+    @skipUnless(connection.vendor == 'postgresql', 'UPDATE ... FROM (VALUES ...) is Postgres only')
+    def test_flush_values(self, ensure_flusher):
+        counters._flush_values([(self.viewed.id, 5, 0), (self.added.id, 1, 1)], 10)
+        self.assertEqual(self.counts(), {
+            'Quiet': (0, 0, 0), 'Viewed': (5, 0, 5), 'Added': (1, 1, 11)})
+
+
+class CatalogVersionTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_evicted_version_does_not_repeat(self):
+        product = make_product(name='Before')
+        self.client.get(f'/api/product/{product.id}/')
+        version = catalog_cache.catalog_version()
+        self.assertIsNotNone(cache.get(catalog_cache.product_key(version, product.id)))
+
+        cache.delete(catalog_cache.CATALOG_VERSION_KEY)
+        with self.captureOnCommitCallbacks(execute=True):
+            catalog_cache.bump_catalog_version()
+        self.assertNotEqual(catalog_cache.catalog_version(), version)
+        Product.objects.filter(pk=product.pk).update(name='After')
+        response = self.client.get(f'/api/product/{product.id}/')
+        self.assertEqual(response.json()['name'], 'After')
+
+    def test_bumped_on_commit(self):
+        product = make_product(name='Old name')
+        version = catalog_cache.catalog_version()
+        with self.captureOnCommitCallbacks(execute=True):
+            product.name = 'New name'
+            product.save()
+            # A reader during the transaction still caches the old version
+            self.client.get(f'/api/product/{product.id}/')
+            self.assertEqual(catalog_cache.catalog_version(), version)
+        self.assertNotEqual(catalog_cache.catalog_version(), version)
+        self.assertEqual(self.client.get(f'/api/product/{product.id}/').json()['name'], 'New name')
+
+    async def test_async_seed(self):
+        await cache.adelete(catalog_cache.CATALOG_VERSION_KEY)
+        version = await catalog_cache.acatalog_version()
+        self.assertGreater(version, 1)
+        self.assertEqual(catalog_cache.catalog_version(), version)
+
+
+class CatalogChangesTests(TestCase):
+    def test_changes_are_appended_on_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            product = make_product()
+            self.assertFalse(CatalogChange.objects.exists())
+        for callback in callbacks:
+            callback()
+
+        response = self.client.get('/api/products/changes/?since=0')
+        self.assertEqual([item['id'] for item in response.json()['products']], [product.id])
+        cursor = response.json()['cursor']
+
+        product_id = product.id
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        response = self.client.get(f'/api/products/changes/?since={cursor}')
+        self.assertEqual(response.json()['deleted_products'], [product_id])
+
+
+class AdminBulkUploadTests(TransactionTestCase):
+    def test_uploads_run_after_commit(self):
+        admin = User.objects.create_superuser('admin', 'admin@example.com', 'secret')
+        self.client.force_login(admin)
+        product = make_product()
+        in_transaction = []
+
+        def upload(*args, **kwargs):
+            in_transaction.append(connection.in_atomic_block)
+            return upload_product_images(*args, **kwargs)
+
+        data = {
+            'name': product.name, 'price': '10.00', 'original_price': '12.00',
+            'category': 'Women', 'stock': 1,
+            'bulk_images': [image_file('a.jpg'), image_file('b.jpg')],
+            'images-TOTAL_FORMS': 0, 'images-INITIAL_FORMS': 0,
+        }
+        with mock.patch('api.admin.upload_product_images', upload):
+            response = self.client.post(f'/admin/api/product/{product.id}/change/', data)
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(in_transaction, [False])
+        self.assertEqual(product.images.count(), 2)
+
+
+class CatalogSnapshotViewTests(TestCase):
+    def test_disabled(self):
+        response = self.client.get('/api/catalog/snapshot/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_missing_snapshot_is_built_in_background(self):
+        with tempfile.TemporaryDirectory() as root, override_settings(
+                CATALOG_SNAPSHOT_ENABLED=True, CATALOG_SNAPSHOT_ROOT=root):
+            with mock.patch('api.views.request_build') as request_build:
+                response = self.client.get('/api/catalog/snapshot/')
+            self.assertEqual(response.status_code, 503)
+            request_build.assert_called_once_with()
+
+            make_product()
+            snapshots.build_snapshot()
+            response = self.client.get('/api/catalog/snapshot/')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['count'], 1)
+
+
+class RelatedProductsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        rng = random.Random(7)
+        products = [make_product(name=f'Product {n}') for n in range(12)]
+        cls.carts = []
+        for n in range(60):
+            cart = Cart.objects.create(temporary_user=f'guest-{n}')
+            chosen = rng.sample(products, rng.randint(1, 5))
+            CartItem.objects.bulk_create(
+                CartItem(cart=cart, product=product, quantity=1) for product in chosen)
+            cls.carts.append(sorted(product.id for product in chosen))
+
+    def expected_pairs(self):
+        return Counter(pair for cart in self.carts for pair in combinations(cart, 2))
+
+    def test_counts_match_brute_force(self):
+        # A tiny batch makes every cart go through a merge
+        with mock.patch.object(recommendations, 'MERGE_BATCH', 3):
+            keys, counts = recommendations.count_pairs(max_cart_size=50, chunk_size=7)
+        self.assertEqual(list(keys), sorted(keys))
+        mask = (1 << recommendations.PAIR_SHIFT) - 1
+        counted = {(key >> recommendations.PAIR_SHIFT, key & mask): count
+                   for key, count in zip(keys, counts)}
+        self.assertEqual(counted, dict(self.expected_pairs()))
+
+    def test_pruning_bounds_tracked_pairs(self):
+        with mock.patch.object(recommendations, 'MERGE_BATCH', 3), \
+                override_settings(RELATED_PRODUCTS_MAX_PAIRS=20):
+            keys, counts = recommendations.count_pairs(max_cart_size=50, chunk_size=7)
+        expected = self.expected_pairs()
+        self.assertGreater(len(expected), 40)
+        # The last batch (3 occurrences plus one cart's 10 pairs) is not pruned
+        self.assertLessEqual(len(keys), 20 + 3 + 10)
+        mask = (1 << recommendations.PAIR_SHIFT) - 1
+        for key, count in zip(keys, counts):
+            pair = (key >> recommendations.PAIR_SHIFT, key & mask)
+            self.assertLessEqual(count, expected[pair])
+
+    def test_build_stores_top_partners(self):
+        recommendations.build_related_products(top_k=3, min_count=2)
+        expected = self.expected_pairs()
+        for product_id in {pk for cart in self.carts for pk in cart}:
+            scores = sorted(
+                ((count, -(b if a == product_id else a)) for (a, b), count in expected.items()
+                 if product_id in (a, b) and count >= 2), reverse=True)[:3]
+            stored = list(RelatedProduct.objects.filter(product_id=product_id).order_by(
+                'rank').values_list('score', 'related_id'))
+            self.assertEqual(stored, [(count, -negated) for count, negated in scores])
+
+
+@override_settings(CART_STORAGE='api.carts.CookieCartStorage', CART_COOKIE_MAX_ITEMS=2)
+class CookieCartTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [make_product(name=f'Product {n}') for n in range(3)]
+
+    def setUp(self):
+        cache.clear()
+
+    def add(self, product, quantity=1):
+        response = self.client.post(
+            '/api/cart/', {'productId': product.id, 'quantity': quantity},
+            content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+
+    def lines(self):
+        return [(item['id'], item['quantity']) for item in self.client.get('/api/cart/').json()]
+
+    def test_line_ids_survive_promotion(self):
+        first, second, third = self.products
+        self.add(first, 2)
+        self.add(second)
+        self.assertFalse(Cart.objects.exists())
+        self.assertEqual(self.lines(), [(first.id, 2), (second.id, 1)])
+        self.assertEqual(self.client.get(f'/api/cart/{first.id}/').json(),
+                         {'id': first.id, 'quantity': 2})
+
+        self.add(third)  # Over CART_COOKIE_MAX_ITEMS, moves to the database
+        self.assertEqual(CartItem.objects.count(), 3)
+        self.assertEqual(sorted(self.lines()), [(first.id, 2), (second.id, 1), (third.id, 1)])
+        self.assertEqual(self.client.get(f'/api/cart/{first.id}/').json(),
+                         {'id': first.id, 'quantity': 2})
+
+    def test_login_merges_database_cart(self):
+        first, second, third = self.products
+        self.add(first, 2)
+        self.add(second)
+        self.add(third)  # Moved to a guest Cart
+        guest_cart = Cart.objects.get()
+        user = User.objects.create_user('shopper', password='secret')
+        Cart.objects.create(user=user).cartitem_set.create(product=first, quantity=1)
+        self.client.force_login(user)
+
+        response = self.client.get('/api/cart/')
+        self.assertEqual(sorted((item['id'], item['quantity']) for item in response.json()),
+                         [(first.id, 3), (second.id, 1), (third.id, 1)])
+        self.assertEqual(response.cookies['guest_cart'].value, '')
+        self.assertFalse(Cart.objects.filter(pk=guest_cart.pk).exists())
+        self.assertEqual(len(self.lines()), 3)
+
+    def test_rejects_quantities_below_one(self):
+        for storage in ['api.carts.CookieCartStorage', 'api.carts.DatabaseCartStorage']:
+            for url in ['/api/cart/', '/api/async/cart/']:
+                with self.subTest(storage=storage, url=url), self.settings(CART_STORAGE=storage):
+                    response = self.client.post(
+                        url, {'productId': self.products[0].id, 'quantity': -5},
+                        content_type='application/json')
+                    self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.lines(), [])
+        self.assertFalse(CartItem.objects.exists())
+
+    def test_async_views_use_the_storage(self):
+        first, second, _ = self.products
+        self.add(first, 2)
+        response = self.client.post(
+            '/api/async/cart/', {'productId': second.id, 'quantity': 1},
+            content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(Cart.objects.exists())
+        self.assertEqual([(item['id'], item['quantity'])
+                          for item in self.client.get('/api/async/cart/').json()],
+                         [(first.id, 2), (second.id, 1)])
+        self.assertEqual(self.client.get(f'/api/async/cart/{first.id}/').json(),
+                         {'id': first.id, 'quantity': 2})
+
+    @override_settings(CART_COOKIE_SECURE=True, CART_COOKIE_SAMESITE='None')
+    def test_cross_site_cookie(self):
+        self.add(self.products[0])
+        cookie = self.client.cookies['guest_cart']
+        self.assertEqual((cookie['samesite'], cookie['secure']), ('None', True))
+
+
+@override_settings(CART_STORAGE='api.carts.CookieCartStorage')
+class IdempotencyTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.products = [make_product(name=f'Product {n}') for n in range(2)]
+
+    def setUp(self):
+        cache.clear()
+
+    def add(self, client, product, key=None, **headers):
+        if key:
+            headers['Idempotency-Key'] = key
+        return client.post('/api/cart/', {'productId': product.id, 'quantity': 1},
+                           content_type='application/json', headers=headers)
+
+    def lines(self, client, **headers):
+        return sorted((item['id'], item['quantity'])
+                      for item in client.get('/api/cart/', headers=headers).json())
+
+    def test_late_retry_keeps_newer_cart(self):
+        first, second = self.products
+        guest = {'X-Temporary-User': 'guest-1'}
+        self.assertEqual(self.add(self.client, first, 'key-1', **guest).status_code, 201)
+        self.assertEqual(self.add(self.client, second, **guest).status_code, 201)
+
+        response = self.add(self.client, first, 'key-1', **guest)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response['Idempotent-Replayed'], 'true')
+        self.assertNotIn('guest_cart', response.cookies)
+        self.assertEqual(self.lines(self.client, **guest), [(first.id, 1), (second.id, 1)])
+
+    @override_settings(CART_STORAGE='api.carts.DatabaseCartStorage')
+    def test_async_cart_honours_the_key(self):
+        product = self.products[0]
+        guest = {'X-Temporary-User': 'guest-1', 'Idempotency-Key': 'key-1'}
+        for replayed in [False, True]:
+            response = self.client.post(
+                '/api/async/cart/', {'productId': product.id, 'quantity': 1},
+                content_type='application/json', headers=guest)
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.has_header('Idempotent-Replayed'), replayed)
+        self.assertEqual(CartItem.objects.get().quantity, 1)
+
+    def test_clients_sharing_an_address(self):
+        first, second = self.products
+        other = Client()
+        self.add(self.client, first)
+        self.add(other, second)
+
+        self.assertEqual(self.add(self.client, first, 'key-1').status_code, 201)
+        response = self.add(other, first, 'key-1')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(response.has_header('Idempotent-Replayed'))
+        self.assertEqual(self.lines(self.client), [(first.id, 2)])
+        self.assertEqual(self.lines(other), [(first.id, 1), (second.id, 1)])
+
+
+@override_settings(CART_STORAGE='api.carts.CookieCartStorage',
+                   DATABASE_ROUTERS=['backend.routers.ReplicaRouter'])
+class CookieCartLoginTests(TestCase):
+    """replica_0 never receives the cart, like a replica lagging behind"""
+    databases = {'default', 'replica_0'}
+
+    def setUp(self):
+        cache.clear()
+
+    def test_login_promotion_reads_primary(self):
+        product = make_product()
+        response = self.client.post('/api/cart/', {'productId': product.id, 'quantity': 3},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 201)
+        cache.clear()  # Drop the guest's pin, as if it had expired
+        user = User.objects.create_user('shopper', password='secret')
+        self.client.force_login(user)
+
+        for _ in range(2):  # The promoting request, then the next one
+            response = self.client.get('/api/cart/')
+            self.assertEqual([(item['id'], item['quantity']) for item in response.json()],
+                             [(product.id, 3)])
+        self.assertEqual(CartItem.objects.get(cart__user=user).quantity, 3)
@@ -0,0 +1,139 @@
+"""
+Bulk product image uploads.
+
+Files are sent to Cloudinary from a bounded thread pool, each retried with
+exponential backoff, and the ProductImage rows for the successful uploads
+are created with a single bulk_create once every upload has finished.
+Each file is also decoded locally for its placeholder (api.placeholders)
+before it is sent, so no image has to be downloaded back afterwards.
+
+The uploader is pluggable through settings.IMAGE_UPLOADER: a callable
+taking a file object and returning Cloudinary's upload response (at least
+`public_id`, plus `version`, `format`, `type` and `resource_type` when
+known). Only transient errors are retried (see is_transient); a rejected
+file or bad credentials fail on the first attempt.
+"""
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cloudinary import CloudinaryResource
+from cloudinary import exceptions as cloudinary_errors
+from django.conf import settings
+from django.utils.module_loading import import_string
+
+from .changes import record_changes
+from .models import CatalogChange, ProductImage
+from .placeholders import analyze_image
+from .projections import refresh_product_cards
+from .variants import build_srcset, eager_transformations
+
+logger = logging.getLogger(__name__)
+
+# Cloudinary's 4xx answers, retrying them cannot succeed
+PERMANENT_ERRORS = (
+    cloudinary_errors.BadRequest,
+    cloudinary_errors.AuthorizationRequired,
+    cloudinary_errors.NotAllowed,
+    cloudinary_errors.NotFound,
+    cloudinary_errors.AlreadyExists,
+)
+
+
+def cloudinary_upload(file, **options):
+    import cloudinary.uploader
+    return cloudinary.uploader.upload(
+        file, resource_type='image', eager=eager_transformations(),
+        eager_async=True, **options)
+
+
+def get_uploader():
+    return import_string(settings.IMAGE_UPLOADER)
+
+
+def is_transient(exc):
+    """
+    Rate limiting, server errors and network failures. The SDK raises the
+    base Error for the last two, while local errors (unreadable file) and
+    4xx responses are permanent.
+    """
+    if isinstance(exc, PERMANENT_ERRORS):
+        return False
+    return isinstance(exc, (cloudinary_errors.Error, ConnectionError, TimeoutError))
+
+
+def upload_with_retry(uploader, file, retries, backoff):
+    for attempt in range(retries + 1):
+        try:
+            if hasattr(file, 'seek'):
+                file.seek(0)
+            return uploader(file)
+        except Exception as exc:
+            if attempt == retries or not is_transient(exc):
+                raise
+            delay = backoff * 2 ** attempt
+            logger.warning('Upload of %s failed (%s), retrying in %.1fs',
+                           getattr(file, 'name', file), exc, delay)
+            time.sleep(delay)
+
+
+def analyze_and_upload(uploader, file, retries, backoff):
+    try:
+        values = analyze_image(file)
+    except Exception as exc:
+        # Left blank for backfill_image_placeholders, the upload matters more
+        logger.warning('Could not analyze %s: %s', getattr(file, 'name', file), exc)
+        values = {}
+    return upload_with_retry(uploader, file, retries, backoff), values
+
+
+def to_resource(result):
+    return CloudinaryResource(
+        public_id=result['public_id'],
+        version=result.get('version'),
+        format=result.get('format'),
+        type=result.get('type', 'upload'),
+        resource_type=result.get('resource_type', 'image'),
+        metadata=result,
+    )
+
+
+def upload_product_images(product, files, alt_text='', uploader=None,
+                          max_workers=None, retries=None, backoff=None):
+    """
+    Upload `files` concurrently and create their ProductImage rows.
+
+    Returns (created images, [(file name, error)] for uploads that failed
+    permanently or after all retries).
+    """
+    files = list(files)
+    if not files:
+        return [], []
+    uploader = uploader or get_uploader()
+    max_workers = max_workers or settings.IMAGE_UPLOAD_WORKERS
+    retries = settings.IMAGE_UPLOAD_RETRIES if retries is None else retries
+    backoff = settings.IMAGE_UPLOAD_BACKOFF if backoff is None else backoff
+
+    with ThreadPoolExecutor(max_workers=min(max_workers, len(files))) as pool:
+        futures = [
+            (file, pool.submit(analyze_and_upload, uploader, file, retries, backoff))
+            for file in files
+        ]
+
+    images, failures = [], []
+    for file, future in futures:
+        try:
+            result, values = future.result()
+        except Exception as exc:
+            failures.append((getattr(file, 'name', str(file)), exc))
+            continue
+        resource = to_resource(result)
+        images.append(ProductImage(
+            product=product, image=resource, alt_text=alt_text,
+            srcset=build_srcset(resource), **values))
+
+    images = ProductImage.objects.bulk_create(images)
+    if images:
+        record_changes(CatalogChange.IMAGE, [image.pk for image in images])
+        refresh_product_cards([product.pk])
+    return images, failures
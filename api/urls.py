@@ -1,10 +1,19 @@
 from django.urls import path
-from . import views
+from . import async_views, views
 urlpatterns = [
     path('products/', views.ProductView.as_view()),
+    path('products/changes/', views.CatalogChangesView.as_view()),
+    path('products/batch/', views.ProductBatchView.as_view()),
+    path('catalog/snapshot/', views.CatalogSnapshotView.as_view()),
     path("product/<int:id>/", views.SingleProductView.as_view()),
+    path('product/<int:id>/related/', views.RelatedProductsView.as_view()),
     path('cart/', views.CartView.as_view()),
     path('cart/<int:id>/', views.SingleCartView.as_view()),
     path('customer-message/', views.CustomerMessageView.as_view()),
 
+    path('async/products/', async_views.product_list),
+    path('async/product/<int:id>/', async_views.product_detail),
+    path('async/cart/', async_views.cart),
+    path('async/cart/<int:id>/', async_views.cart_item),
+
 ]
@@ -0,0 +1,52 @@
+"""
+Responsive product image variants.
+
+settings.IMAGE_VARIANTS names each way the frontend shows product images
+with the widths it needs and a Cloudinary crop. Every width is delivered
+with f_auto/q_auto, so Cloudinary picks AVIF, WebP or JPEG per browser and
+tunes the compression. The `srcset` string of each variant is built once
+when an image is stored and kept in ProductImage.srcset;
+refresh_image_srcsets rebuilds them after the registry changes.
+
+Uploads ask Cloudinary to derive the widths listed under a variant's
+`eager` straight away, so the first visitor does not wait for on-the-fly
+transformation.
+"""
+from django.conf import settings
+
+
+def transformation(spec, width):
+    step = {'width': width, 'crop': spec.get('crop', 'limit')}
+    if spec.get('aspect_ratio'):
+        step['aspect_ratio'] = spec['aspect_ratio']
+    return [step, {'fetch_format': 'auto', 'quality': 'auto'}]
+
+
+def build_srcset(image):
+    """{variant name: `srcset` attribute value} for a CloudinaryResource"""
+    if not image:
+        return {}
+    return {
+        name: ', '.join(
+            f"{image.build_url(transformation=transformation(spec, width))} {width}w"
+            for width in spec['widths'])
+        for name, spec in settings.IMAGE_VARIANTS.items()
+    }
+
+
+def eager_transformations(instance=None):
+    """The `eager` upload option; CloudinaryField calls it with the instance"""
+    return [
+        {'transformation': transformation(spec, width)}
+        for spec in settings.IMAGE_VARIANTS.values()
+        for width in spec.get('eager', [])
+    ]
+
+
+def request_eager(public_id):
+    """Have Cloudinary derive the eager variants of an existing image"""
+    import cloudinary.uploader
+    eager = eager_transformations()
+    if eager:
+        cloudinary.uploader.explicit(
+            public_id, type='upload', eager=eager, eager_async=True)
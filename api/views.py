@@ -1,77 +1,210 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
+from django.db.models import Prefetch
 from django.shortcuts import get_object_or_404
-from .models import Cart, CartItem, Product, CustomerMessage
+from django.conf import settings
+from django.core.cache import cache
+from . import cache as catalog_cache
+from . import counters
+from .carts import get_cart_storage
+from .filters import filter_products
+from .idempotency import idempotent
+from .changes import changes_since
+from .snapshots import current_snapshot, request_build
+from .models import CatalogChange, Product, ProductImage, CustomerMessage
 from .serializers import (
-    CartItemSerializer,
-    ProductSerializer,
+    ProductCardSerializer,
+    ProductImageChangeSerializer,
     SingleProductSerializer,
-    SingleCartItemSerializer,
-    CustomerMessageSerializer
+    CustomerMessageSerializer,
+    query_param_list,
 )
 from rest_framework.permissions import AllowAny
 
 
+def product_queryset(serializer_class, request):
+    """Products loading only the columns the requested fields read"""
+    fields = serializer_class.requested_fields(request)
+    queryset = Product.objects.only(*[name for name in fields if name != 'images'])
+    if 'images' in fields:
+        queryset = queryset.prefetch_related(Prefetch(
+            'images',
+            queryset=ProductImage.objects.only(*serializer_class.image_columns(request)),
+        ))
+    return queryset
+
+
+def product_details(request, ids):
+    """
+    SingleProductSerializer data for `ids` as {id: data}, served from the
+    per-product catalog cache where possible. Sparse requests (?fields=,
+    ?image_variants=) bypass the cache since it holds full payloads.
+    """
+    sparse = 'fields' in request.query_params or 'image_variants' in request.query_params
+    found = {}
+    if not sparse:
+        version = catalog_cache.catalog_version()
+        keys = {catalog_cache.product_key(version, pk): pk for pk in ids}
+        found = {keys[key]: data for key, data in cache.get_many(keys).items()}
+    missing = [pk for pk in ids if pk not in found]
+    if missing:
+        products = product_queryset(SingleProductSerializer, request).filter(id__in=missing)
+        fresh = {item['id']: item for item in SingleProductSerializer(
+            products, many=True, context={'request': request}).data}
+        found.update(fresh)
+        if not sparse and fresh:
+            cache.set_many({catalog_cache.product_key(version, pk): data
+                            for pk, data in fresh.items()}, catalog_cache.timeout())
+    return found
+
+
 class ProductView(APIView):
     permission_classes = [AllowAny]
+    query_budget = 1
 
     def get(self, request):
-        product = Product.objects.all()
-        product_serializer = ProductSerializer(product, many=True)
+        try:
+            product = filter_products(
+                product_queryset(ProductCardSerializer, request), request.query_params)
+        except ValueError as error:
+            return Response({'error': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        product_serializer = ProductCardSerializer(
+            product, many=True, context={'request': request})
         return Response(product_serializer.data, status=status.HTTP_200_OK)
 
 
+class CatalogChangesView(APIView):
+    permission_classes = [AllowAny]
+    query_budget = 3
+
+    def get(self, request):
+        try:
+            since = int(request.query_params.get('since', 0))
+            limit = min(int(request.query_params.get('limit', settings.CATALOG_CHANGES_PAGE_SIZE)),
+                        settings.CATALOG_CHANGES_PAGE_SIZE)
+        except ValueError:
+            return Response({'error': 'since and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({'error': 'limit must be positive'}, status=status.HTTP_400_BAD_REQUEST)
+
+        changes = changes_since(since, limit)
+        product_ids = {object_id for _, kind, object_id in changes if kind == CatalogChange.PRODUCT}
+        image_ids = {object_id for _, kind, object_id in changes if kind == CatalogChange.IMAGE}
+        products = list(Product.objects.filter(id__in=product_ids).only(
+            *ProductCardSerializer.Meta.fields)) if product_ids else []
+        images = list(ProductImage.objects.filter(id__in=image_ids)) if image_ids else []
+
+        return Response({
+            'cursor': changes[-1][0] if changes else since,
+            'has_more': len(changes) == limit,
+            'products': ProductCardSerializer(products, many=True).data,
+            'deleted_products': sorted(product_ids - {product.id for product in products}),
+            'images': ProductImageChangeSerializer(images, many=True).data,
+            'deleted_images': sorted(image_ids - {image.id for image in images}),
+        }, status=status.HTTP_200_OK)
+
+
+class CatalogSnapshotView(APIView):
+    permission_classes = [AllowAny]
+
+    def get(self, request):
+        if not settings.CATALOG_SNAPSHOT_ENABLED:
+            return Response({'error': 'Catalog snapshots are disabled'}, status=status.HTTP_404_NOT_FOUND)
+        manifest = current_snapshot()
+        if manifest is None:
+            request_build()
+            response = Response({'error': 'Catalog snapshot is being built'}, status=status.HTTP_503_SERVICE_UNAVAILABLE)
+            response['Retry-After'] = settings.CATALOG_SNAPSHOT_DEBOUNCE
+            return response
+        response = Response(manifest, status=status.HTTP_200_OK)
+        response['Cache-Control'] = f'public, max-age={settings.CATALOG_SNAPSHOT_DEBOUNCE}'
+        return response
+
+
 class SingleProductView(APIView):
     permission_classes = [AllowAny]
+    query_budget = 2
 
     def get(self, request, id):
-        try:
-            product = Product.objects.get(id=id)
-        except Product.DoesNotExist:
+        product = product_details(request, [id]).get(id)
+        if product is None:
             return Response({"message": "product is not found"}, status=status.HTTP_404_NOT_FOUND)
-        product_serializer = SingleProductSerializer(product)
-        return Response(product_serializer.data, status=status.HTTP_200_OK)
+        counters.record_view(id)
+        return Response(product, status=status.HTTP_200_OK)
 
 
-class CartView(APIView):
-    def get_cart(self, request, temporary_user):
-        if request.user.is_authenticated:
-            cart, _ = Cart.objects.get_or_create(user=request.user)
-        else:
-            cart, _ = Cart.objects.get_or_create(temporary_user=temporary_user)
-        return cart
+class RelatedProductsView(APIView):
+    permission_classes = [AllowAny]
+    query_budget = 1
+
+    def get(self, request, id):
+        key = catalog_cache.related_products_key(catalog_cache.catalog_version(), id)
+        data = cache.get(key)
+        if data is None:
+            products = Product.objects.filter(recommended_with__product_id=id).order_by(
+                'recommended_with__rank').only(*ProductCardSerializer.Meta.fields)
+            data = list(ProductCardSerializer(products, many=True).data)
+            cache.set(key, data, catalog_cache.timeout())
+        return Response(data, status=status.HTTP_200_OK)
+
+
+class ProductBatchView(APIView):
+    permission_classes = [AllowAny]
+    query_budget = 2
 
     def get(self, request):
-        temporary_user = request.headers.get('X-Temporary-User')
-        cart = self.get_cart(request, temporary_user)
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in query_param_list(request, 'ids')))
+        except ValueError:
+            return Response({'error': 'ids must be a comma separated list of integers'}, status=status.HTTP_400_BAD_REQUEST)
+        if not ids:
+            return Response({'error': 'ids is required'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) > settings.PRODUCT_BATCH_MAX:
+            return Response({'error': f'At most {settings.PRODUCT_BATCH_MAX} ids per request'}, status=status.HTTP_400_BAD_REQUEST)
+
+        products = product_details(request, ids)
+        return Response({
+            'products': [products[pk] for pk in ids if pk in products],
+            'missing': [pk for pk in ids if pk not in products],
+        }, status=status.HTTP_200_OK)
+
+
+class CartStorageMixin:
+    """Write back the cart cookie of api.carts.CookieCartStorage"""
 
-        cart_items = CartItem.objects.filter(cart=cart)
-        serializer = CartItemSerializer(cart_items, many=True)
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(request, response, *args, **kwargs)
+        if hasattr(request, '_cart_storage'):
+            request._cart_storage.update_response(response)
+        return response
 
-        return Response(serializer.data, status=status.HTTP_200_OK)
 
+class CartView(CartStorageMixin, APIView):
+    query_budget = {'get': 6, 'post': 5, 'put': 4, 'delete': 4}
+
+    def get(self, request):
+        items = get_cart_storage(request).items()
+        return Response(items, status=status.HTTP_200_OK)
+
+    @idempotent
     def post(self, request):
-        temporary_user = request.headers.get('X-Temporary-User')
-        cart = self.get_cart(request, temporary_user)
+        storage = get_cart_storage(request)
 
         product_id = request.data.get('productId')
         quantity = int(request.data.get('quantity', 1))
 
-        product = get_object_or_404(Product, id=product_id)
-        cart_item, created = CartItem.objects.get_or_create(
-            cart=cart, product=product, defaults={'quantity': quantity}
-        )
+        if quantity < 1:
+            return Response({'error': 'Quantity must be at least 1'}, status=status.HTTP_400_BAD_REQUEST)
 
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
+        product = get_object_or_404(Product, id=product_id)
+        storage.add(product, quantity)
+        counters.record_cart_add(product.id)
 
         return Response({'message': 'Cart item added successfully'}, status=status.HTTP_201_CREATED)
 
     def put(self, request):
-        temporary_user = request.headers.get('X-Temporary-User')
-        cart = self.get_cart(request, temporary_user)
+        storage = get_cart_storage(request)
 
         product_id = request.data.get('productId')
         new_quantity = int(request.data.get('quantity', 1))
@@ -80,19 +213,12 @@ class CartView(APIView):
             return Response({'error': 'Quantity must be at least 1'}, status=status.HTTP_400_BAD_REQUEST)
 
         product = get_object_or_404(Product, id=product_id)
-        cart_item = get_object_or_404(CartItem, cart=cart, product=product)
-
-        cart_item.quantity = new_quantity
-        cart_item.save()
+        storage.update(product, new_quantity)
 
         return Response({'message': 'Cart item quantity updated'}, status=status.HTTP_200_OK)
 
     def delete(self, request):
-        temporary_user = request.headers.get('X-Temporary-User')
-        cart = self.get_cart(request, temporary_user)
-
-        if cart is None:
-            return Response({'error': 'Temporary user ID is missing'}, status=status.HTTP_400_BAD_REQUEST)
+        storage = get_cart_storage(request)
 
         product_id = request.query_params.get('productId')
 
@@ -104,38 +230,23 @@ class CartView(APIView):
         except Product.DoesNotExist:
             return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
 
-        CartItem.objects.filter(cart=cart, product=product).delete()
-
-        serializer = CartItemSerializer(
-            CartItem.objects.filter(cart=cart), many=True)
+        storage.remove(product)
         return Response({'message': 'Item deleted successfully'}, status=status.HTTP_200_OK)
 
 
-class SingleCartView(APIView):
+class SingleCartView(CartStorageMixin, APIView):
     permission_classes = [AllowAny]
-
-    def get_cart(self, request, temporary_user):
-        if request.user.is_authenticated:
-            cart = Cart.objects.get(user=request.user)
-        else:
-            cart = Cart.objects.get(temporary_user=temporary_user)
-        return cart
+    query_budget = 3
 
     def get(self, request, id):
-        temporary_user = request.headers.get('X-Temporary-User')
-
-        try:
-            cart = self.get_cart(request, temporary_user)
-            product = Product.objects.get(id=id)
-            cart_items = CartItem.objects.get(cart=cart, product=product)
-            serializer = SingleCartItemSerializer(cart_items)
-            return Response(serializer.data, status=status.HTTP_200_OK)
-
-        except:
-            return Response({}, status=status.HTTP_200_OK)
+        item = get_cart_storage(request).item(id)
+        return Response(item, status=status.HTTP_200_OK)
 
 
 class CustomerMessageView(APIView):
+    query_budget = 1
+
+    @idempotent
     def post(self, request):
         serializer = CustomerMessageSerializer(data=request.data)
         if serializer.is_valid():
@@ -0,0 +1,49 @@
+"""
+Read replica routing.
+
+Replicas are configured with REPLICA_DATABASE_URLS and registered as
+`replica_<n>` databases. Reads are sent to a random replica only inside
+read_from_replicas(), which api.middleware.ReplicaRoutingMiddleware enters
+for safe-method requests; everything else, including every write, uses
+`default`.
+"""
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+_use_replicas = ContextVar('use_replicas', default=False)
+
+
+def replica_aliases():
+    return [alias for alias in settings.DATABASES if alias.startswith('replica_')]
+
+
+@contextmanager
+def read_from_replicas(enabled=True):
+    token = _use_replicas.set(enabled)
+    try:
+        yield
+    finally:
+        _use_replicas.reset(token)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Related lookups follow the object, e.g. prefetches of rows
+            # deliberately read from the primary
+            return instance._state.db
+        if _use_replicas.get():
+            replicas = replica_aliases()
+            if replicas:
+                return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
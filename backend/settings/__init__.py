@@ -0,0 +1,2 @@
+# Settings profiles: production (the default of manage.py, WSGI and ASGI),
+# local and test. Pick one with DJANGO_SETTINGS_MODULE or --settings.
@@ -0,0 +1,262 @@
+"""
+Settings shared by every profile. Environment specific values (secret
+key, hosts, databases, Cloudinary credentials) live in production.py,
+local.py and test.py, one of which DJANGO_SETTINGS_MODULE must name.
+"""
+import os
+import dj_database_url
+from decouple import config
+from pathlib import Path
+from datetime import timedelta
+from corsheaders.defaults import default_headers
+# Build paths inside the project like this: BASE_DIR / 'subdir'.
+BASE_DIR = Path(__file__).resolve().parent.parent.parent
+
+# Profiles set their own; the defaults below that depend on it are
+# recomputed by local.py.
+DEBUG = config("DEBUG", default=False, cast=bool)
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'api.apps.ApiConfig',
+    'admin_api',
+    'rest_framework',
+    'rest_framework_simplejwt.token_blacklist',
+    'rest_framework_simplejwt',
+    'corsheaders',
+    'cloudinary',
+    'cloudinary_storage'
+]
+
+MIDDLEWARE = [
+    'api.middleware.QueryAuditMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'corsheaders.middleware.CorsMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'api.middleware.StaticFilesMiddleware',
+]
+
+# SIMPLE_JWT = {
+#     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=2),
+#     'REFRESH_TOKEN_LIFETIME': timedelta(days=30),
+#     'ROTATE_REFRESH_TOKENS': False,
+#     'AUTH_COOKIE': 'access_token',
+#     'AUTH_COOKIE_SECURE': False,
+#     'AUTH_COOKIE_HTTP_ONLY': True,
+#     'AUTH_COOKIE_PATH': '/',
+#     'AUTH_COOKIE_SAMESITE': 'Lax'
+# }
+# REST_FRAMEWORK = {
+#     'DEFAULT_AUTHENTICATION_CLASSES': [
+#         'api.authentication.CookieJwtAuthentication'
+#     ]
+# }
+ROOT_URLCONF = 'backend.urls'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'backend.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/5.1/ref/settings/#databases
+# DATABASES is set by each profile, which adds REPLICA_DATABASES to it.
+
+# Optional read replicas, comma separated database URLs. Safe-method API
+# requests read from them (backend.routers.ReplicaRouter) unless the client
+# wrote within the last REPLICA_PIN_SECONDS.
+REPLICA_DATABASE_URLS = [
+    url.strip() for url in config("REPLICA_DATABASE_URLS", default="").split(",")
+    if url.strip()
+]
+REPLICA_DATABASES = {}
+for index, url in enumerate(REPLICA_DATABASE_URLS):
+    REPLICA_DATABASES[f'replica_{index}'] = dj_database_url.parse(url)
+    REPLICA_DATABASES[f'replica_{index}']['TEST'] = {'MIRROR': 'default'}
+
+DATABASE_ROUTERS = ['backend.routers.ReplicaRouter']
+REPLICA_PIN_SECONDS = config("REPLICA_PIN_SECONDS", default=5, cast=int)
+
+# Password validation
+# https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/5.1/topics/i18n/
+
+LANGUAGE_CODE = 'en-us'
+
+TIME_ZONE = 'UTC'
+
+USE_I18N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/5.1/howto/static-files/
+
+STATIC_URL = '/static/'
+STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
+STORAGES = {
+    'default': {
+        'BACKEND': 'cloudinary_storage.storage.MediaCloudinaryStorage',
+    },
+    'staticfiles': {
+        'BACKEND': 'whitenoise.storage.CompressedManifestStaticFilesStorage',
+    },
+}
+
+# Cart storage (api.carts): DatabaseCartStorage or CookieCartStorage, which
+# keeps guest carts of up to CART_COOKIE_MAX_ITEMS products in a signed
+# cookie. The frontend is another origin, so a Secure cookie is sent with
+# SameSite=None; without Secure browsers refuse None and it falls back to Lax.
+CART_STORAGE = config("CART_STORAGE", default="api.carts.DatabaseCartStorage")
+CART_COOKIE_NAME = 'guest_cart'
+CART_COOKIE_SALT = 'api.carts'
+CART_COOKIE_MAX_ITEMS = config("CART_COOKIE_MAX_ITEMS", default=20, cast=int)
+CART_COOKIE_MAX_AGE = config("CART_COOKIE_MAX_AGE", default=60 * 60 * 24 * 30, cast=int)
+CART_COOKIE_SECURE = config("CART_COOKIE_SECURE", default=not DEBUG, cast=bool)
+CART_COOKIE_SAMESITE = config(
+    "CART_COOKIE_SAMESITE", default='None' if CART_COOKIE_SECURE else 'Lax')
+
+# Idempotency-Key replays (api.idempotency), kept in the default cache
+IDEMPOTENCY_TTL = config("IDEMPOTENCY_TTL", default=60 * 60 * 24, cast=int)
+IDEMPOTENCY_LOCK_SECONDS = config("IDEMPOTENCY_LOCK_SECONDS", default=10, cast=int)
+
+# Buffered product view/cart-add counters (api.counters)
+POPULARITY_COUNTERS_ENABLED = config("POPULARITY_COUNTERS_ENABLED", default=True, cast=bool)
+POPULARITY_FLUSH_INTERVAL = config("POPULARITY_FLUSH_INTERVAL", default=5, cast=float)
+POPULARITY_CART_WEIGHT = config("POPULARITY_CART_WEIGHT", default=10, cast=int)
+
+# "Frequently bought together" (api.recommendations)
+RELATED_PRODUCTS_TOP_K = config("RELATED_PRODUCTS_TOP_K", default=8, cast=int)
+RELATED_PRODUCTS_MIN_COUNT = config("RELATED_PRODUCTS_MIN_COUNT", default=2, cast=int)
+RELATED_PRODUCTS_MAX_CART_SIZE = config("RELATED_PRODUCTS_MAX_CART_SIZE", default=50, cast=int)
+RELATED_PRODUCTS_MAX_PAIRS = config("RELATED_PRODUCTS_MAX_PAIRS", default=2000000, cast=int)
+
+# Static catalog snapshots (api.snapshots), served by StaticFilesMiddleware
+CATALOG_SNAPSHOT_ENABLED = config("CATALOG_SNAPSHOT_ENABLED", default=True, cast=bool)
+CATALOG_SNAPSHOT_ROOT = config(
+    "CATALOG_SNAPSHOT_ROOT", default=os.path.join(BASE_DIR, 'snapshots'))
+CATALOG_SNAPSHOT_URL = '/snapshots/'
+CATALOG_SNAPSHOT_DEBOUNCE = config("CATALOG_SNAPSHOT_DEBOUNCE", default=30, cast=int)
+CATALOG_SNAPSHOT_KEEP = config("CATALOG_SNAPSHOT_KEEP", default=3, cast=int)
+
+# Default primary key field type
+# https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
+
+DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# CORS_ALLOWED_ORIGINS = [config('FRONTEND_URL')]
+CORS_ALLOW_ALL_ORIGINS = True
+CORS_ALLOW_CREDENTIALS = True
+CORS_ALLOW_HEADERS = list(default_headers)+["x-temporary-user", "idempotency-key"]
+# MEDIA_URL = 'media/'
+# MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+
+RATELIMIT_USE_X_FORWARDED_FOR = True
+
+# Cache shared by the catalog cache, replica pinning and friends. Set
+# REDIS_URL in production so every worker sees the same entries.
+if config("REDIS_URL", default=""):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': config("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+CATALOG_CACHE_TIMEOUT = config("CATALOG_CACHE_TIMEOUT", default=300, cast=int)
+PRODUCT_BATCH_MAX = config("PRODUCT_BATCH_MAX", default=50, cast=int)
+
+# Catalog delta feed (api.changes)
+CATALOG_CHANGES_PAGE_SIZE = config("CATALOG_CHANGES_PAGE_SIZE", default=500, cast=int)
+CATALOG_CHANGES_SETTLE_SECONDS = config(
+    "CATALOG_CHANGES_SETTLE_SECONDS", default=2, cast=int)
+
+# Query auditing (api.query_audit): N+1 and slow query detection plus the
+# per-view query_budget. QUERY_AUDIT_RAISE turns a blown budget into an
+# error so the test suite fails on it.
+QUERY_AUDIT_ENABLED = config("QUERY_AUDIT_ENABLED", default=DEBUG, cast=bool)
+QUERY_AUDIT_SLOW_MS = config("QUERY_AUDIT_SLOW_MS", default=100, cast=int)
+QUERY_AUDIT_REPEAT_THRESHOLD = config(
+    "QUERY_AUDIT_REPEAT_THRESHOLD", default=3, cast=int)
+QUERY_AUDIT_RAISE = config("QUERY_AUDIT_RAISE", default=False, cast=bool)
+
+# Cloudinary credentials are configured by each profile. With
+# CLOUDINARY_FAKE, api.fake_cloudinary replaces the upload and admin APIs
+# with an in-process store so nothing goes over the network.
+CLOUDINARY_FAKE = False
+
+# Bulk product image uploads (api.uploads)
+IMAGE_UPLOADER = config("IMAGE_UPLOADER", default="api.uploads.cloudinary_upload")
+IMAGE_UPLOAD_WORKERS = config("IMAGE_UPLOAD_WORKERS", default=4, cast=int)
+IMAGE_UPLOAD_RETRIES = config("IMAGE_UPLOAD_RETRIES", default=2, cast=int)
+IMAGE_UPLOAD_BACKOFF = config("IMAGE_UPLOAD_BACKOFF", default=0.5, cast=float)
+
+# Responsive product image variants (api.variants): widths served in each
+# variant's srcset, and those Cloudinary derives at upload time
+IMAGE_VARIANTS = {
+    'square': {'widths': [160, 320, 480, 640], 'crop': 'fill',
+               'aspect_ratio': '1:1', 'eager': [320, 480]},
+    'full': {'widths': [480, 768, 1080, 1440, 1920], 'crop': 'limit',
+             'eager': [768, 1080]},
+}
+
+# Dimensions and blurred placeholders of product images (api.placeholders)
+IMAGE_PLACEHOLDER_ENABLED = config("IMAGE_PLACEHOLDER_ENABLED", default=True, cast=bool)
+IMAGE_PLACEHOLDER_OPENER = config(
+    "IMAGE_PLACEHOLDER_OPENER", default="api.placeholders.open_image_url")
+IMAGE_PLACEHOLDER_WORKERS = config("IMAGE_PLACEHOLDER_WORKERS", default=2, cast=int)
+IMAGE_PLACEHOLDER_SIZE = config("IMAGE_PLACEHOLDER_SIZE", default=16, cast=int)
+IMAGE_PLACEHOLDER_QUALITY = config("IMAGE_PLACEHOLDER_QUALITY", default=40, cast=int)
@@ -0,0 +1,63 @@
+"""
+Self-contained profile for development and benchmarks: no environment
+variables needed, a SQLite file in WAL mode, a local-memory cache and
+the in-process fake Cloudinary (api.fake_cloudinary).
+
+    python manage.py migrate --settings=backend.settings.local
+    python manage.py seed_catalog --settings=backend.settings.local
+"""
+import cloudinary
+
+from .base import *  # noqa: F401,F403
+from .base import BASE_DIR, REPLICA_DATABASES, config
+
+SECRET_KEY = config("SECRET_KEY", default="django-insecure-local-profile-only")
+DEBUG = config("DEBUG", default=True, cast=bool)
+ALLOWED_HOSTS = ['*']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': config("SQLITE_PATH", default=str(BASE_DIR / 'db.sqlite3')),
+        'OPTIONS': {
+            # WAL lets readers run while a write is in progress, and
+            # IMMEDIATE avoids "database is locked" on lock upgrades
+            'init_command': 'PRAGMA journal_mode=WAL; PRAGMA synchronous=NORMAL;',
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    **REPLICA_DATABASES,
+}
+
+CSRF_TRUSTED_ORIGINS = ['http://localhost:3000', 'http://localhost:8000']
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    }
+}
+
+CLOUDINARY_FAKE = True
+cloudinary.config(cloud_name='local', api_key='local', api_secret='local', secure=True)
+CLOUDINARY_STORAGE = {'CLOUD_NAME': 'local', 'API_KEY': 'local', 'API_SECRET': 'local'}
+STORAGES = {
+    'default': {
+        'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    },
+    'staticfiles': {
+        # No collectstatic manifest needed
+        'BACKEND': 'django.contrib.staticfiles.storage.StaticFilesStorage',
+    },
+}
+# Served by backend.urls under DEBUG; without them the media route would
+# serve the whole working directory
+MEDIA_ROOT = BASE_DIR / 'media'
+MEDIA_URL = '/media/'
+IMAGE_UPLOADER = 'api.fake_cloudinary.upload'
+IMAGE_PLACEHOLDER_OPENER = 'api.fake_cloudinary.open_image'
+
+# Defaults in base.py that follow DEBUG
+CART_COOKIE_SECURE = config("CART_COOKIE_SECURE", default=not DEBUG, cast=bool)
+CART_COOKIE_SAMESITE = config(
+    "CART_COOKIE_SAMESITE", default='None' if CART_COOKIE_SECURE else 'Lax')
+QUERY_AUDIT_ENABLED = config("QUERY_AUDIT_ENABLED", default=DEBUG, cast=bool)
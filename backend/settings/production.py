@@ -0,0 +1,40 @@
+"""
+Production profile: every secret and host comes from the environment
+(or .env) and is required.
+"""
+import cloudinary
+import dj_database_url
+
+from .base import *  # noqa: F401,F403
+from .base import REPLICA_DATABASES, config
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = config("SECRET_KEY")
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = config("DEBUG", cast=bool)
+
+ALLOWED_HOSTS = config("ALLOWED_HOSTS").split(",")
+
+DATABASES = {
+    'default': dj_database_url.config(
+        default=config("DATABASE_URL")
+    ),
+    **REPLICA_DATABASES,
+}
+
+CSRF_TRUSTED_ORIGINS = [config('FRONTEND_URL'), config(
+    'BACKEND_URL'),]
+
+cloudinary.config(
+    cloud_name=config('CLOUDINARY_CLOUD_NAME'),
+    api_key=config('CLOUDINARY_API_KEY'),
+    api_secret=config('CLOUDINARY_API_SECRET'),
+    secure=True
+)
+
+CLOUDINARY_STORAGE = {
+    'CLOUD_NAME': config('CLOUDINARY_CLOUD_NAME'),
+    'API_KEY': config('CLOUDINARY_API_KEY'),
+    'API_SECRET': config('CLOUDINARY_API_SECRET'),
+}
@@ -0,0 +1,36 @@
+"""
+Test profile: in-memory SQLite per test process, fast password hashing,
+no background threads, and query budgets that fail the test on overrun.
+
+    python manage.py test --settings=backend.settings.test --parallel
+"""
+from .local import *  # noqa: F401,F403
+
+DEBUG = False
+
+# replica_0 is a separate database for api.tests.ReplicaRoutingTests, which
+# turn ReplicaRouter on; every other test reads and writes `default`.
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+    'replica_0': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': ':memory:',
+    },
+}
+DATABASE_ROUTERS = []
+
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+
+CART_COOKIE_SECURE = False
+CART_COOKIE_SAMESITE = 'Lax'
+QUERY_AUDIT_ENABLED = True
+QUERY_AUDIT_RAISE = True
+
+CATALOG_CHANGES_SETTLE_SECONDS = 0
+CATALOG_SNAPSHOT_ENABLED = False
+POPULARITY_COUNTERS_ENABLED = False
+IMAGE_UPLOAD_BACKOFF = 0
+IMAGE_PLACEHOLDER_ENABLED = False